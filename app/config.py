@@ -2,6 +2,7 @@
 Application Configuration
 """
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,18 +21,170 @@ class Settings:
     MEDIA_ROOT: str = os.path.join(os.getcwd(), 'media')
     MEDIA_URL: str = "/media/"
 
+    # Media storage: "local" keeps originals and heatmaps under MEDIA_ROOT/uploads,
+    # "s3" puts them in an S3-compatible bucket (AWS, MinIO) and hands clients
+    # presigned URLs. S3_PUBLIC_ENDPOINT_URL is the endpoint browsers can reach
+    # when it differs from the one the API uses (e.g. http://minio:9000 inside
+    # docker-compose); S3_PUBLIC_BASE_URL skips presigning for a public bucket/CDN.
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local").lower()
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "visionflow-media")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "uploads/")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")
+    S3_PUBLIC_ENDPOINT_URL: str = os.getenv("S3_PUBLIC_ENDPOINT_URL", "")
+    S3_PUBLIC_BASE_URL: str = os.getenv("S3_PUBLIC_BASE_URL", "")
+    S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    S3_PRESIGN_SECONDS: int = int(os.getenv("S3_PRESIGN_SECONDS", 3600))
+    S3_MULTIPART_CHUNK_BYTES: int = int(os.getenv("S3_MULTIPART_CHUNK_BYTES", 8 * 1024 * 1024))
+
+    # Serving local media: "direct" streams files from the API with immutable
+    # caching, ETags and Range support; "x-accel" (nginx) and "x-sendfile"
+    # (Apache, lighttpd) answer with a header only and the front proxy sends
+    # the bytes. MEDIA_ACCEL_PREFIX is the nginx `internal` location aliased
+    # to MEDIA_ROOT/uploads.
+    MEDIA_SERVE_MODE: str = os.getenv("MEDIA_SERVE_MODE", "direct").lower()
+    MEDIA_ACCEL_PREFIX: str = os.getenv("MEDIA_ACCEL_PREFIX", "/internal-media/")
+
     # Email Configuration
     EMAIL_HOST: str = os.getenv("EMAIL_HOST", "smtp.gmail.com")
     EMAIL_PORT: int = int(os.getenv("EMAIL_PORT", 465))
     EMAIL_USERNAME: str = os.getenv("EMAIL_HOST_USER", os.getenv("EMAIL_USERNAME", ""))
     EMAIL_PASSWORD: str = os.getenv("EMAIL_HOST_PASSWORD", os.getenv("EMAIL_PASSWORD", ""))
     DEFAULT_FROM_EMAIL: str = os.getenv("DEFAULT_FROM_EMAIL", "noreply@visionflow.ai")
+    # Enabled by default when credentials are set; set EMAIL_ENABLED=true for an unauthenticated local sink
+    EMAIL_ENABLED: bool = os.getenv(
+        "EMAIL_ENABLED", str(bool(EMAIL_USERNAME and EMAIL_PASSWORD))
+    ).lower() in ("1", "true", "yes")
+    EMAIL_USE_SSL: bool = os.getenv("EMAIL_USE_SSL", str(EMAIL_PORT == 465)).lower() in ("1", "true", "yes")
+    EMAIL_USE_TLS: bool = os.getenv("EMAIL_USE_TLS", str(EMAIL_PORT != 465)).lower() in ("1", "true", "yes")
+    EMAIL_TIMEOUT_SECONDS: float = float(os.getenv("EMAIL_TIMEOUT_SECONDS", 30))
+
+    # Email outbox worker
+    EMAIL_OUTBOX_POLL_SECONDS: float = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", 10))
+    EMAIL_OUTBOX_BATCH_SIZE: int = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 20))
+    EMAIL_OUTBOX_STALE_SECONDS: int = int(os.getenv("EMAIL_OUTBOX_STALE_SECONDS", 600))
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+    EMAIL_RETRY_BASE_SECONDS: float = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+    EMAIL_RETRY_MAX_SECONDS: float = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+
+    # Server-Timing header on these path prefixes; admins sending PROFILE_HEADER
+    # also get a pyinstrument profile of the request saved under PROFILES_DIR
+    SERVER_TIMING_PATHS: tuple = tuple(p for p in os.getenv("SERVER_TIMING_PATHS", "/api/analyze").split(",") if p)
+    PROFILE_HEADER: str = os.getenv("PROFILE_HEADER", "X-Debug-Profile")
+    PROFILE_INTERVAL_SECONDS: float = float(os.getenv("PROFILE_INTERVAL_SECONDS", 0.001))
+    PROFILES_DIR: str = os.path.join(MEDIA_ROOT, 'profiles')
+    PROFILES_KEEP: int = int(os.getenv("PROFILES_KEEP", 100))
 
     # OpenRouter API
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
+    OPENROUTER_BASE_URL: str = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+    OPENROUTER_MODEL: str = os.getenv("OPENROUTER_MODEL", "google/gemini-2.0-flash-001")
 
     # Model Configuration
-    YOLO_MODEL_PATH: str = "yolo11n_openvino_model/"
+    # "fp32" is the bundled export, "int8" the output of scripts/quantize_model.py;
+    # YOLO_MODEL_PATH overrides both
+    YOLO_MODEL_VARIANTS = {
+        "fp32": "yolo11n_openvino_model/",
+        "int8": "yolo11n_int8_openvino_model/",
+    }
+    YOLO_MODEL_VARIANT: str = os.getenv("YOLO_MODEL_VARIANT", "fp32").lower()
+    YOLO_MODEL_PATH: str = os.getenv("YOLO_MODEL_PATH", YOLO_MODEL_VARIANTS.get(YOLO_MODEL_VARIANT, YOLO_MODEL_VARIANTS["fp32"]))
     CONFIDENCE_THRESHOLD: float = 0.25
 
+    # Inference placement: "local" loads the model in every API worker,
+    # "server" sends frames to `python -m app.inference_server` over shared memory
+    INFERENCE_MODE: str = os.getenv("INFERENCE_MODE", "local").lower()
+    INFERENCE_SERVER_SOCKET: str = os.getenv("INFERENCE_SERVER_SOCKET", "/tmp/visionflow-inference.sock")
+
+    # Detector backend: "ultralytics" (YOLO wrapper) or "openvino" (native runtime)
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "ultralytics").lower()
+    OPENVINO_DEVICE: str = os.getenv("OPENVINO_DEVICE", "CPU")
+    OPENVINO_PERFORMANCE_HINT: str = os.getenv("OPENVINO_PERFORMANCE_HINT", "LATENCY")
+    OPENVINO_NUM_STREAMS: str = os.getenv("OPENVINO_NUM_STREAMS", "")
+    OPENVINO_INFER_REQUESTS: int = int(os.getenv("OPENVINO_INFER_REQUESTS", 0))
+
+    # Inference micro-batching
+    INFERENCE_MAX_BATCH_SIZE: int = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 8))
+    INFERENCE_MAX_WAIT_MS: float = float(os.getenv("INFERENCE_MAX_WAIT_MS", 5))
+
+    # Result cache: reuse boxes, heatmap and advice of an earlier analysis of
+    # the same upload (sha256) with the same model and threshold. The
+    # perceptual (dHash) lookup also catches re-encoded copies.
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESULT_CACHE_PERCEPTUAL: bool = os.getenv("RESULT_CACHE_PERCEPTUAL", "false").lower() in ("1", "true", "yes")
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", 1024 * 1024))
+
+    # Upload limits: bytes per image, pixels per image (read from the JPEG/PNG/
+    # BMP/WebP header before decode) and whole request bodies of the batch and
+    # video endpoints. Larger uploads are answered with 413 before decode.
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+    MAX_IMAGE_PIXELS: int = int(os.getenv("MAX_IMAGE_PIXELS", 50_000_000))
+    MAX_BATCH_UPLOAD_BYTES: int = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", 256 * 1024 * 1024))
+    MAX_VIDEO_UPLOAD_BYTES: int = int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", 1024 * 1024 * 1024))
+
+    # Batch analysis (/api/analyze/batch): images per request (zip members
+    # included) and how many are in flight at once
+    MAX_BATCH_IMAGES: int = int(os.getenv("MAX_BATCH_IMAGES", 100))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", 8))
+    MAX_ZIP_MEMBER_BYTES: int = int(os.getenv("MAX_ZIP_MEMBER_BYTES", 25 * 1024 * 1024))
+
+    # Video analysis (/api/analyze/video): frames sampled per second of video,
+    # longest clip processed, decoded frames buffered ahead of inference,
+    # tracks shorter than VIDEO_MIN_TRACK_FRAMES left out of the summary
+    VIDEO_SAMPLE_FPS: float = float(os.getenv("VIDEO_SAMPLE_FPS", 5))
+    VIDEO_MAX_SAMPLE_FPS: float = float(os.getenv("VIDEO_MAX_SAMPLE_FPS", 30))
+    VIDEO_MAX_DURATION_SECONDS: float = float(os.getenv("VIDEO_MAX_DURATION_SECONDS", 1800))
+    VIDEO_QUEUE_FRAMES: int = int(os.getenv("VIDEO_QUEUE_FRAMES", 16))
+    VIDEO_MIN_TRACK_FRAMES: int = int(os.getenv("VIDEO_MIN_TRACK_FRAMES", 2))
+    VIDEO_PROGRESS_SECONDS: float = float(os.getenv("VIDEO_PROGRESS_SECONDS", 2))
+    VIDEO_TMP_DIR: str = os.getenv("VIDEO_TMP_DIR", tempfile.gettempdir())
+
+    # Live streams: per-stream detection rate, streams per process, seconds
+    # without a frame before reconnecting (with exponential backoff),
+    # messages buffered per WebSocket subscriber, FPS averaging window.
+    # Local file sources are for tests and off by default.
+    STREAM_DEFAULT_FPS: float = float(os.getenv("STREAM_DEFAULT_FPS", 5))
+    STREAM_MAX_FPS: float = float(os.getenv("STREAM_MAX_FPS", 30))
+    STREAM_MAX_STREAMS: int = int(os.getenv("STREAM_MAX_STREAMS", 16))
+    STREAM_READ_TIMEOUT_SECONDS: float = float(os.getenv("STREAM_READ_TIMEOUT_SECONDS", 10))
+    STREAM_RECONNECT_SECONDS: float = float(os.getenv("STREAM_RECONNECT_SECONDS", 2))
+    STREAM_RECONNECT_MAX_SECONDS: float = float(os.getenv("STREAM_RECONNECT_MAX_SECONDS", 30))
+    STREAM_SUBSCRIBER_QUEUE: int = int(os.getenv("STREAM_SUBSCRIBER_QUEUE", 8))
+    STREAM_STATS_WINDOW_SECONDS: float = float(os.getenv("STREAM_STATS_WINDOW_SECONDS", 10))
+    STREAM_ALLOW_FILES: bool = os.getenv("STREAM_ALLOW_FILES", "false").lower() in ("1", "true", "yes")
+
+    # Heatmap: attention mask is computed at most this many pixels on the long side
+    HEATMAP_MASK_MAX_SIDE: int = int(os.getenv("HEATMAP_MASK_MAX_SIDE", 1024))
+
+    # Heatmap rendering: "eager" renders during /analyze, "lazy" on first view
+    HEATMAP_MODE: str = os.getenv("HEATMAP_MODE", "eager").lower()
+    HEATMAP_CACHE_DIR: str = os.path.join(MEDIA_ROOT, 'heatmap_cache')
+    HEATMAP_CACHE_MAX_BYTES: int = int(os.getenv("HEATMAP_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+    # History thumbnails (WebP): "background" renders them after each analysis,
+    # "lazy" on first request; long side, WebP quality, concurrent renders
+    THUMBNAIL_MODE: str = os.getenv("THUMBNAIL_MODE", "background").lower()
+    THUMBNAIL_MAX_SIDE: int = int(os.getenv("THUMBNAIL_MAX_SIDE", 320))
+    THUMBNAIL_QUALITY: int = int(os.getenv("THUMBNAIL_QUALITY", 75))
+    THUMBNAIL_CONCURRENCY: int = int(os.getenv("THUMBNAIL_CONCURRENCY", 2))
+
+    # Worker pools for blocking work kept off the event loop
+    CPU_POOL_WORKERS: int = int(os.getenv("CPU_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+    IO_POOL_WORKERS: int = int(os.getenv("IO_POOL_WORKERS", 8))
+
+    # Advice provider HTTP client (read timeout, retries, circuit breaker)
+    ADVICE_TIMEOUT_SECONDS: float = float(os.getenv("ADVICE_TIMEOUT_SECONDS", 15))
+    ADVICE_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("ADVICE_CONNECT_TIMEOUT_SECONDS", 3))
+    ADVICE_MAX_CONNECTIONS: int = int(os.getenv("ADVICE_MAX_CONNECTIONS", 20))
+    ADVICE_MAX_RETRIES: int = int(os.getenv("ADVICE_MAX_RETRIES", 2))
+    ADVICE_RETRY_BACKOFF_SECONDS: float = float(os.getenv("ADVICE_RETRY_BACKOFF_SECONDS", 0.2))
+    ADVICE_BREAKER_THRESHOLD: int = int(os.getenv("ADVICE_BREAKER_THRESHOLD", 5))
+    ADVICE_BREAKER_RESET_SECONDS: float = float(os.getenv("ADVICE_BREAKER_RESET_SECONDS", 30))
+
+    # Advice cache (bump ADVICE_PROMPT_VERSION whenever the prompt changes)
+    ADVICE_CACHE_TTL_SECONDS: int = int(os.getenv("ADVICE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+    ADVICE_PROMPT_VERSION: str = os.getenv("ADVICE_PROMPT_VERSION", "v1")
+    ADVICE_PREWARM: bool = os.getenv("ADVICE_PREWARM", "false").lower() in ("1", "true", "yes")
+
 settings = Settings()
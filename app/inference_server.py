@@ -0,0 +1,65 @@
+"""
+Standalone Inference Server
+One process owns the compiled model; API workers started with
+INFERENCE_MODE=server send it frames through shared memory.
+
+  python -m app.inference_server --socket /tmp/visionflow-inference.sock
+"""
+import argparse
+import asyncio
+import os
+
+from app.config import settings
+
+# This process always runs the model itself
+settings.INFERENCE_MODE = "local"
+
+from app.services.inference import scheduler  # noqa: E402
+from app.services.inference_ipc import encode_result, read_message, read_shared_frame, send_message  # noqa: E402
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            request = await read_message(reader)
+            if request is None:
+                break
+            try:
+                frame = read_shared_frame(request["shm"], request["shape"], request["dtype"])
+                result = await scheduler.submit(frame)
+                reply = encode_result(result)
+            except Exception as e:
+                reply = {"error": f"{type(e).__name__}: {e}"}
+            await send_message(writer, reply)
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: str):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    scheduler.start()
+    server = await asyncio.start_unix_server(handle_client, path=socket_path)
+    os.chmod(socket_path, 0o660)
+    print(f"✅ Inference server listening on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await scheduler.stop()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared inference server")
+    parser.add_argument("--socket", default=settings.INFERENCE_SERVER_SOCKET, help="Unix socket path")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
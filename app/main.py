@@ -1,14 +1,24 @@
 """
 FastAPI Main Application Entry Point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
-import os
+import asyncio
 
 from app.database import db_service
-from app.routes import auth_routes, detection_routes, subscription_routes, user_routes, admin_routes
+from app.config import settings
+from app.services.advice import advice_cache
+from app.services.advice_client import advice_client
+from app.services.email import email_outbox
+from app.services.inference import read_model_metadata, scheduler
+from app.services.executor import shutdown_executors
+from app.services.metrics import MetricsMiddleware, render_metrics
+from app.services.profiling import ServerTimingMiddleware
+from app.services.thumbnails import thumbnail_service
+from app.services.uploads import UploadLimitMiddleware
+from app.services.streams import stream_manager
+from app.routes import auth_routes, detection_routes, subscription_routes, user_routes, admin_routes, stream_routes, media_routes
 
 
 @asynccontextmanager
@@ -17,8 +27,25 @@ async def lifespan(app: FastAPI):
     # Startup
     await db_service.connect()
     print("✅ Database connected")
+    scheduler.start()
+    await advice_client.start()
+    email_outbox.start()
+    stream_manager.start(scheduler.submit)
+    prewarm = None
+    if settings.ADVICE_PREWARM:
+        names = read_model_metadata(settings.YOLO_MODEL_PATH).get("names", {})
+        prewarm = asyncio.create_task(advice_cache.prewarm([*names.values(), "Nothing detected"]))
     yield
     # Shutdown
+    if prewarm is not None:
+        prewarm.cancel()
+    await stream_manager.stop()
+    await thumbnail_service.stop()
+    await scheduler.stop()
+    await advice_client.close()
+    await email_outbox.stop()
+    # Draining the pools blocks; keep the loop free while in-flight work finishes
+    await asyncio.to_thread(shutdown_executors)
     await db_service.disconnect()
     print("🔌 Database disconnected")
 
@@ -31,6 +58,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Request body caps for the upload endpoints (innermost, so 413s get CORS
+# headers and show up in metrics)
+app.add_middleware(UploadLimitMiddleware)
+
 # CORS Configuration
 app.add_middleware(
     CORSMiddleware,
@@ -38,15 +69,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
-# Ensure media directory exists
-MEDIA_DIR = os.path.join(os.getcwd(), 'media')
-UPLOAD_DIR = os.path.join(MEDIA_DIR, 'uploads')
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Server-Timing stage breakdown (and admin-triggered profiles) for /api/analyze
+app.add_middleware(ServerTimingMiddleware)
+
+# Request counts and latency per route template and status
+app.add_middleware(MetricsMiddleware)
 
-# Mount static files
-app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+# Stored media; only uploads are public (profiles and the heatmap cache are not).
+# Originals, heatmaps and thumbnails are sharded below it (ab/cd/<kind>_<id>.jpg),
+# served with immutable caching or handed to the front proxy (MEDIA_SERVE_MODE).
+# With a remote storage backend the same paths redirect to the object store.
+app.include_router(media_routes.router, tags=["Media"])
 
 # Include routers
 app.include_router(auth_routes.router, prefix="/api", tags=["Authentication"])
@@ -54,6 +90,7 @@ app.include_router(detection_routes.router, prefix="/api", tags=["Detection"])
 app.include_router(user_routes.router, prefix="/api", tags=["User"])
 app.include_router(subscription_routes.router, prefix="/api", tags=["Subscription"])
 app.include_router(admin_routes.router, prefix="/api", tags=["Admin"])
+app.include_router(stream_routes.router, prefix="/api", tags=["Streams"])
 
 
 @app.get("/")
@@ -68,3 +105,10 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    payload, content_type = render_metrics(scheduler.queue_depth)
+    return Response(content=payload, headers={"Content-Type": content_type})
@@ -95,12 +95,21 @@ class AuthResponse(BaseModel):
 
 
 # Detection Models
+class DetectedObject(BaseModel):
+    label: str
+    class_id: int
+    confidence: float
+    box: List[float]  # x1, y1, x2, y2 in image pixels
+
+
 class DetectionResponse(BaseModel):
     id: int
     detected: str
     advice: str
     heatmap_url: str
     original_url: str
+    detections: List[DetectedObject] = []  # most confident first
+    cached: bool = False  # reused an earlier result for the same image
 
 
 class HistoryItem(BaseModel):
@@ -109,7 +118,10 @@ class HistoryItem(BaseModel):
     advice: str
     image_path: str
     heatmap_path: str
+    thumbnail_url: Optional[str] = None  # WebP, THUMBNAIL_MAX_SIDE on the long side
+    heatmap_thumbnail_url: Optional[str] = None
     created_at: str
+    detections: List[DetectedObject] = []  # most confident first
 
 
 # User Profile Models
@@ -136,6 +148,8 @@ class StatsResponse(BaseModel):
     mostCommonObjects: Dict[str, int]
     detectionsByDate: Dict[str, int]
     recentDetections: int
+    totalObjects: int = 0
+    objectsByClass: Dict[str, int] = {}  # every stored box, not just the headline label
 
 
 # Generic Response
@@ -220,10 +234,44 @@ class AdminUserResponse(BaseModel):
     daily_used: Optional[int] = None
 
 
+class ProfileItem(BaseModel):
+    name: str
+    size_bytes: int
+    created_at: str
+
+
 class UpdateUserRoleRequest(BaseModel):
     role: UserRole
 
 
+# Live stream models
+class StreamCreateRequest(BaseModel):
+    url: str
+    name: Optional[str] = None
+    id: Optional[str] = None
+    target_fps: Optional[float] = None
+
+
+class StreamInfo(BaseModel):
+    id: str
+    name: str
+    url: str
+    state: str
+    target_fps: float
+    achieved_fps: float
+    capture_fps: float
+    frames_captured: int
+    frames_processed: int
+    frames_dropped: int
+    overruns: int
+    reconnects: int
+    subscribers: int
+    subscriber_drops: int
+    last_latency_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    created_at: str
+
+
 class PlanInfo(BaseModel):
     name: str
     label: str
@@ -1,8 +1,10 @@
 """
-Admin-only Routes: stats and user management
+Admin-only Routes: stats, user management and request profiles
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
 from typing import List
+import os
 
 from app.database import db_service
 from app.models import (
@@ -10,9 +12,12 @@ from app.models import (
     AdminUserResponse,
     UpdateUserRoleRequest,
     MessageResponse,
+    ProfileItem,
     TokenData,
 )
 from app.services.auth import require_admin
+from app.services.executor import run_io
+from app.services.profiling import PROFILE_NAME_RE, list_profiles, profile_path
 
 router = APIRouter()
 
@@ -77,3 +82,18 @@ async def update_user_role(
 
     await db_service.update_user_role(user_id, payload.role.value)
     return MessageResponse(message=f"User role updated to {payload.role.value}.")
+
+
+@router.get("/admin/profiles", response_model=List[ProfileItem])
+async def get_profiles(current_user: TokenData = Depends(require_admin)):
+    """Request profiles captured with the debug profile header, newest first"""
+    return [ProfileItem(**item) for item in await run_io(list_profiles)]
+
+
+@router.get("/admin/profiles/{profile_name}")
+async def download_profile(profile_name: str, current_user: TokenData = Depends(require_admin)):
+    """Download one pyinstrument HTML report"""
+    path = profile_path(profile_name)
+    if not PROFILE_NAME_RE.match(profile_name) or not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="text/html", filename=profile_name)
@@ -2,29 +2,236 @@
 Detection Routes (Controller)
 """
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status, Query, Depends
-from typing import Optional, List
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from typing import AsyncIterator, Dict, Optional, List, Tuple, Union
+from collections import Counter
 import os
-import time
+import re
+import json
 import shutil
+import tempfile
+import time
+import asyncio
 from datetime import datetime
-from ultralytics import YOLO
+
+import anyio
+import numpy as np
 
 from app.models import DetectionResponse, HistoryItem, MessageResponse
 from app.database import db_service
-from app.utils import generate_gradcam, get_contextual_advice
+from app.utils import (
+    TooManyImagesError,
+    decode_image,
+    detected_objects,
+    detection_labels,
+    extract_zip_images,
+    dhash,
+    pack_detections,
+    rescale_detections,
+    stored_detections,
+    unpack_detections,
+)
+from app.services.advice import advice_cache
+from app.services.detection_types import DetectionResult
+from app.services.inference import MODEL_KEY, class_names, scheduler
+from app.services.executor import run_cpu, run_io
+from app.services.heatmap_cache import encode_heatmap, heatmap_cache, render_heatmap_bytes
+from app.services.metrics import RESULT_CACHE_HITS, RESULT_CACHE_MISSES, stage_timer
+from app.services.storage import media_storage, new_media_id
+from app.services.thumbnails import VARIANTS, thumbnail_service
+from app.services.uploads import InvalidImageError, UploadGuard, UploadRejected, oriented_size
+from app.services.video import CountingLine, VideoAnalysis, probe_video
 from app.config import settings
-from app.services.email import send_detection_email
+from app.services.email import enqueue_detection_email
 from app.services.auth import get_current_user
 from app.models import TokenData
 
 router = APIRouter()
 
-# Initialize YOLO model
-model = YOLO(settings.YOLO_MODEL_PATH, task="detect")
+HEATMAP_NAME_RE = re.compile(r"^[A-Za-z0-9_\-]+\.jpg$")
+
+# Lazy heatmap renders in progress, so concurrent first views render once
+_heatmap_renders: Dict[str, asyncio.Task] = {}
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+def _heatmap_name() -> str:
+    """Unique lazy-heatmap name, safe for many analyses per second"""
+    return f"heatmap_{new_media_id()}.jpg"
+
+
+async def _heatmap_stage(detection_result) -> str:
+    """Generate the heatmap now, or render it on first view from the stored boxes"""
+    if settings.HEATMAP_MODE == "lazy":
+        return f"/api/heatmaps/{_heatmap_name()}"
+    with stage_timer("heatmap"):
+        data = await run_cpu(encode_heatmap, detection_result.image, detection_result.boxes)
+        if data is None:
+            raise RuntimeError("Heatmap could not be encoded")
+        key = await run_io(media_storage.save, media_storage.key_for("heatmap", new_media_id()), data)
+        return media_storage.url(key)
+
+
+async def _read_upload(upload: UploadFile) -> Tuple[bytes, str]:
+    """
+    Read an upload in chunks, hashing and checking it as it comes in;
+    returns (data, sha256 hex). Raises UploadRejected as soon as the size,
+    format or header-declared pixel count is out of bounds.
+    """
+    guard = UploadGuard()
+    if upload.size is not None:
+        guard.check_size(upload.size)
+    while True:
+        chunk = await upload.read(settings.UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        guard.feed(chunk)
+    return guard.finish()
+
+
+async def _rescaled_perceptual_hit(cached, image):
+    """
+    Boxes of a perceptual cache hit moved onto `image`. The matched row may
+    be a resized copy, so its boxes are in its own pixel grid; None if its
+    original can no longer be read (the hit is then treated as a miss).
+    """
+    image_key = media_storage.key_from_url(cached.imagePath)
+    if cached.boxes is None or image_key is None:
+        return None
+    source = await run_io(media_storage.read, image_key)
+    size = oriented_size(source) if source else None
+    if not size or not all(size):
+        return None
+    height, width = image.shape[:2]
+    return rescale_detections(stored_detections(cached), width / size[0], height / size[1])
+
+
+async def _analyze_content(data: bytes, content_hash: str) -> dict:
+    """
+    Detection, heatmap and advice for one image. When the same content (or,
+    with RESULT_CACHE_PERCEPTUAL, the same dHash) was analyzed before with
+    the same model and threshold, that result is reused and nothing runs.
+    """
+    # Content-addressed: re-uploads of the same bytes share one file
+    image_key = media_storage.key_for("input", content_hash)
+
+    cached = None
+    rescaled = None
+    perceptual_hash = None
+    if settings.RESULT_CACHE_ENABLED:
+        with stage_timer("result_cache"):
+            cached = await db_service.find_cached_detection(MODEL_KEY, content_hash=content_hash)
+
+    if cached is None:
+        with stage_timer("decode"):
+            image = await run_cpu(decode_image, data)
+        if image is None:
+            raise InvalidImageError("Not a valid image")
+        if settings.RESULT_CACHE_ENABLED and settings.RESULT_CACHE_PERCEPTUAL:
+            perceptual_hash = dhash(image)
+            with stage_timer("result_cache"):
+                cached = await db_service.find_cached_detection(MODEL_KEY, perceptual_hash=perceptual_hash)
+                if cached is not None:
+                    rescaled = await _rescaled_perceptual_hit(cached, image)
+                    if rescaled is None:
+                        cached = None
+
+    # Persist the original concurrently, off the critical path
+    save_original = asyncio.create_task(run_io(media_storage.save_once, image_key, data))
+    try:
+        if cached is not None:
+            RESULT_CACHE_HITS.inc()
+            if rescaled is None:
+                # Same bytes: the boxes and heatmap apply as they are
+                packed_bytes = cached.boxes.decode()
+                heatmap_url = cached.heatmapPath
+            else:
+                # Same scene, other pixels: rescaled boxes and a heatmap of its own
+                packed_bytes = rescaled.tobytes()
+                heatmap_url = await _heatmap_stage(DetectionResult(
+                    image=image,
+                    boxes=rescaled["box"],
+                    confidences=rescaled["confidence"],
+                    class_ids=rescaled["class_id"].astype(np.int32),
+                    names=class_names,
+                ))
+            packed = unpack_detections(packed_bytes)
+            return {
+                "image_key": image_key,
+                "label": cached.objectName,
+                "advice": cached.advice,
+                "heatmap_url": heatmap_url,
+                "packed_bytes": packed_bytes,
+                "packed": packed,
+                "labels": cached.labels,
+                "names": class_names,
+                "perceptual_hash": perceptual_hash if perceptual_hash is not None else cached.perceptualHash,
+                "cached": True,
+            }
+        if settings.RESULT_CACHE_ENABLED:
+            RESULT_CACHE_MISSES.inc()
+
+        # Run YOLO detection once; every later stage reuses this result
+        with stage_timer("inference"):
+            detection_result = await scheduler.submit(image)
+        label = detection_result.label
+        packed_bytes = pack_detections(detection_result)
+        packed = unpack_detections(packed_bytes)
+
+        heatmap_url = await _heatmap_stage(detection_result)
 
-# Ensure upload directory exists
-UPLOAD_DIR = os.path.join(settings.MEDIA_ROOT, 'uploads')
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+        # Get AI advice
+        with stage_timer("advice"):
+            advice = await advice_cache.get(label)
+
+        return {
+            "image_key": image_key,
+            "label": label,
+            "advice": advice,
+            "heatmap_url": heatmap_url,
+            "packed_bytes": packed_bytes,
+            "packed": packed,
+            "labels": detection_labels(packed, detection_result.names),
+            "names": detection_result.names,
+            "perceptual_hash": perceptual_hash,
+            "cached": False,
+        }
+    finally:
+        # Make sure the original is on disk before it is referenced
+        await save_original
+
+
+async def _save_analysis(outcome: dict, content_hash: str, user_id: int):
+    with stage_timer("db_save"):
+        detection = await db_service.create_detection(
+            object_name=outcome["label"],
+            advice=outcome["advice"],
+            image_path=media_storage.url(outcome["image_key"]),
+            heatmap_path=outcome["heatmap_url"],
+            user_id=user_id,
+            boxes=outcome["packed_bytes"],
+            box_count=len(outcome["packed"]),
+            labels=outcome["labels"],
+            content_hash=content_hash,
+            perceptual_hash=outcome["perceptual_hash"],
+            model_key=MODEL_KEY,
+        )
+    # History thumbnails are rendered after the response, off the request path
+    thumbnail_service.schedule(detection)
+    return detection
+
+
+def _analysis_response(detection, outcome: dict) -> DetectionResponse:
+    return DetectionResponse(
+        id=detection.id,
+        detected=outcome["label"],
+        advice=outcome["advice"],
+        heatmap_url=media_storage.resolve_url(outcome["heatmap_url"]),
+        original_url=media_storage.public_url(outcome["image_key"]),
+        detections=detected_objects(outcome["packed"], outcome["names"]),
+        cached=outcome["cached"],
+    )
 
 
 @router.post("/analyze", response_model=DetectionResponse)
@@ -47,79 +254,74 @@ async def analyze_image(
             detail="Email does not match authenticated user"
         )
 
-    # Save uploaded file
-    ts = int(time.time())
-    file_name = f"input_{ts}.jpg"
-    heatmap_name = f"heatmap_{ts}.jpg"
-
-    file_path = os.path.join(UPLOAD_DIR, file_name)
-    heatmap_path = os.path.join(UPLOAD_DIR, heatmap_name)
-
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Read the upload once, hashing and checking it on the way in; every stage shares it
+    with stage_timer("upload_read"):
+        try:
+            data, content_hash = await _read_upload(file)
+        except UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
 
     try:
-        # Run YOLO detection
-        results = model.predict(source=file_path, device='cpu', conf=settings.CONFIDENCE_THRESHOLD)
-        label = results[0].names[int(results[0].boxes.cls[0])] if results[0].boxes else "Nothing detected"
-        class_id = int(results[0].boxes.cls[0]) if results[0].boxes else None
-
-        # Generate heatmap
-        generate_gradcam(model, file_path, class_id=class_id, save_path=heatmap_path)
-
-        # Get AI advice
-        advice = get_contextual_advice(label)
+        try:
+            outcome = await _analyze_content(data, content_hash)
+        except InvalidImageError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is not a valid image"
+            )
 
         # Get user
-        user = await db_service.get_user_by_email(email)
+        with stage_timer("db_user"):
+            user = await db_service.get_user_by_email(email)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
 
-        # Check and increment daily usage limit
-        limit_check = await db_service.check_and_increment_daily_usage(user.id)
-        if not limit_check["allowed"]:
-            if limit_check["reason"] == "no_subscription":
+        # Reserve one analysis from the daily quota (atomic, like batches)
+        with stage_timer("db_usage"):
+            quota = await db_service.reserve_daily_usage(user.id, 1)
+        if quota["granted"] == 0:
+            if quota["reason"] == "no_subscription":
                 raise HTTPException(
                     status_code=status.HTTP_402_PAYMENT_REQUIRED,
                     detail="Active subscription required. Please complete payment and wait for admin approval.",
                 )
+            if quota["reason"] == "busy":
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Usage counter is busy, please retry",
+                )
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail=(
                     f"Daily analysis limit reached "
-                    f"({limit_check['used']}/{limit_check['limit']}). Resets at midnight UTC."
+                    f"({quota['used']}/{quota['limit']}). Resets at midnight UTC."
                 ),
             )
 
-        # Save detection
-        detection = await db_service.create_detection(
-            object_name=label,
-            advice=advice,
-            image_path=f"/media/uploads/{file_name}",
-            heatmap_path=f"/media/uploads/{heatmap_name}",
-            user_id=user.id
-        )
+        # Save detection; the reservation is given back if nothing was saved
+        try:
+            detection = await _save_analysis(outcome, content_hash, user.id)
+        except BaseException:
+            try:
+                await db_service.release_daily_usage(user.id, 1, quota["day"])
+            except Exception as e:
+                print(f"⚠️  Failed to release analysis quota: {e}")
+            raise
 
-        # Send email notification
+        # Queue email notification; the outbox worker delivers it
         user_name = f"{user.firstName} {user.lastName}".strip() or "User"
-        await send_detection_email(
-            user_email=email,
-            user_name=user_name,
-            detected_object=label,
-            advice=advice
-        )
+        with stage_timer("email"):
+            await enqueue_detection_email(
+                user_email=email,
+                user_name=user_name,
+                detected_object=outcome["label"],
+                advice=outcome["advice"]
+            )
 
-        return DetectionResponse(
-            id=detection.id,
-            detected=label,
-            advice=advice,
-            heatmap_url=f"{settings.MEDIA_URL}uploads/{heatmap_name}",
-            original_url=f"{settings.MEDIA_URL}uploads/{file_name}"
-        )
+        return _analysis_response(detection, outcome)
     except HTTPException:
         raise
     except Exception as e:
@@ -132,6 +334,424 @@ async def analyze_image(
         )
 
 
+async def _analyze_batch_item(checked, user_id: int) -> dict:
+    """One image of a batch, checked on the way in: analyze (or reuse) and save; quota already reserved"""
+    if isinstance(checked, UploadRejected):
+        raise checked
+    data, content_hash = checked
+    outcome = await _analyze_content(data, content_hash)
+    # Once the save has started it runs to the end even if the batch is
+    # abandoned, so a saved row is never also refunded
+    save = asyncio.ensure_future(_save_analysis(outcome, content_hash, user_id))
+    try:
+        detection = await asyncio.shield(save)
+    except asyncio.CancelledError:
+        detection = await save
+    return _analysis_response(detection, outcome).model_dump()
+
+
+def _ndjson(payload: dict) -> bytes:
+    return (json.dumps(payload) + "\n").encode()
+
+
+async def _stream_batch(
+    items: List[Tuple[str, Union[Tuple[bytes, str], UploadRejected]]],
+    granted: int,
+    quota: dict,
+    user,
+    email: str,
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON lines: one "batch" header, one "result" or "error" per image in
+    completion order, then a "summary". Quota for images that fail or are
+    never finished (client gone) is released at the end.
+    """
+    start = time.perf_counter()
+    yield _ndjson({
+        "type": "batch",
+        "total": len(items),
+        "accepted": granted,
+        "used": quota["used"],
+        "limit": quota["limit"],
+    })
+
+    # Bounded fan-out; the inference scheduler batches whatever is in flight
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    async def run(index: int, filename: str, checked):
+        async with semaphore:
+            try:
+                return index, filename, await _analyze_batch_item(checked, user.id), None
+            except Exception as e:
+                return index, filename, None, str(e) or type(e).__name__
+
+    tasks = [asyncio.create_task(run(i, name, checked)) for i, (name, checked) in enumerate(items[:granted])]
+    del items[:granted]
+
+    for index, (filename, _) in enumerate(items, start=granted):
+        yield _ndjson({"type": "error", "index": index, "filename": filename, "detail": "daily_limit_reached"})
+
+    labels = Counter()
+    failed = 0
+    reported = set()
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, filename, result, error = await next_done
+            reported.add(index)
+            if error is not None:
+                failed += 1
+                yield _ndjson({"type": "error", "index": index, "filename": filename, "detail": error})
+            else:
+                labels[result["detected"]] += 1
+                yield _ndjson({"type": "result", "index": index, "filename": filename, **result})
+    finally:
+        # A client that leaves cancels this generator, and the awaits below
+        # with it; shield them so the refund still happens
+        with anyio.CancelScope(shield=True):
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            # Settle them first: an image already being saved finishes and is kept
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            # Failures the client never got to see (it left mid-stream) are refunded too
+            unreported = sum(
+                1 for task in tasks
+                if task.cancelled() or (task.result()[0] not in reported and task.result()[3] is not None)
+            )
+            try:
+                await db_service.release_daily_usage(user.id, failed + unreported, quota["day"])
+            except Exception as e:
+                print(f"⚠️  Failed to release batch quota: {e}")
+
+    succeeded = sum(labels.values())
+    if succeeded:
+        # One notification for the whole batch instead of one per image
+        user_name = f"{user.firstName} {user.lastName}".strip() or "User"
+        summary = ", ".join(f"{label} ({count})" for label, count in labels.most_common())
+        await enqueue_detection_email(
+            user_email=email,
+            user_name=user_name,
+            detected_object=f"{succeeded} images: {summary}",
+            advice="Per-image advice and heatmaps are available in your detection history."
+        )
+
+    yield _ndjson({
+        "type": "summary",
+        "succeeded": succeeded,
+        "failed": failed + len(items),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+
+
+@router.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    email: str = Form(...),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Analyze many images (or zip archives of images) in one request.
+    Quota is reserved once for the whole batch; results stream back as
+    NDJSON while later images are still being processed.
+    """
+    if email.lower() != (current_user.email or '').lower():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Email does not match authenticated user"
+        )
+
+    # Read everything now: the uploads are closed once this handler returns.
+    # Each image goes through the same streaming checks as /analyze, so an
+    # oversized or non-image part stops being read at once and is reported
+    # as that item's error; items are (name, (bytes, sha256)) or (name, rejection)
+    items: List[Tuple[str, Union[Tuple[bytes, str], UploadRejected]]] = []
+    with stage_timer("upload_read"):
+        for upload in files:
+            name = upload.filename or f"image_{len(items)}"
+            if upload.content_type in ZIP_CONTENT_TYPES or name.lower().endswith(".zip"):
+                # Members are checked as they are decompressed
+                data = await upload.read()
+                try:
+                    items.extend(await run_io(
+                        extract_zip_images, data,
+                        settings.MAX_BATCH_IMAGES - len(items), settings.MAX_ZIP_MEMBER_BYTES,
+                    ))
+                except TooManyImagesError:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"At most {settings.MAX_BATCH_IMAGES} images per batch"
+                    )
+                except ValueError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"{name}: {e}"
+                    )
+            else:
+                try:
+                    items.append((name, await _read_upload(upload)))
+                except UploadRejected as e:
+                    items.append((name, e))
+            if len(items) > settings.MAX_BATCH_IMAGES:
+                break
+
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No images in request"
+        )
+    if len(items) > settings.MAX_BATCH_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.MAX_BATCH_IMAGES} images per batch"
+        )
+
+    with stage_timer("db_user"):
+        user = await db_service.get_user_by_email(email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    with stage_timer("db_usage"):
+        quota = await db_service.reserve_daily_usage(user.id, len(items))
+    if quota["granted"] == 0:
+        if quota["reason"] == "no_subscription":
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail="Active subscription required. Please complete payment and wait for admin approval.",
+            )
+        if quota["reason"] == "busy":
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Usage counter is busy, please retry",
+            )
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=(
+                f"Daily analysis limit reached "
+                f"({quota['used']}/{quota['limit']}). Resets at midnight UTC."
+            ),
+        )
+
+    return StreamingResponse(
+        _stream_batch(items, quota["granted"], quota, user, email),
+        media_type="application/x-ndjson",
+    )
+
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+
+def _spool_video(source, suffix: str) -> str:
+    """Copy the upload to a named temp file OpenCV can open, in chunks"""
+    fd, path = tempfile.mkstemp(prefix="video_", suffix=suffix, dir=settings.VIDEO_TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+async def _stream_video(analysis: VideoAnalysis, path: str, quota: dict, user, email: str) -> AsyncIterator[bytes]:
+    """
+    NDJSON lines: a "video" header, "progress" every VIDEO_PROGRESS_SECONDS,
+    then a "summary" (or an "error"). The quota is released if the clip
+    could not be analyzed; the temp file is removed either way.
+    """
+    summary = None
+    try:
+        async for event in analysis.events():
+            if event["type"] == "summary":
+                summary = event
+            yield _ndjson(event)
+    except Exception as e:
+        print(f"ERROR in analyze_video: {type(e).__name__}: {str(e)}")
+        yield _ndjson({"type": "error", "detail": str(e) or type(e).__name__})
+    finally:
+        await run_io(os.remove, path)
+        if summary is None:
+            try:
+                await db_service.release_daily_usage(user.id, 1, quota["day"])
+            except Exception as e:
+                print(f"⚠️  Failed to release video quota: {e}")
+
+    if summary is not None:
+        user_name = f"{user.firstName} {user.lastName}".strip() or "User"
+        counts = ", ".join(f"{label} ({count})" for label, count in Counter(summary["counts"]).most_common())
+        with stage_timer("email"):
+            await enqueue_detection_email(
+                user_email=email,
+                user_name=user_name,
+                detected_object=f"Video: {counts or 'nothing tracked'}",
+                advice="Per-track dwell times and line crossings were returned with the analysis."
+            )
+
+
+@router.post("/analyze/video")
+async def analyze_video(
+    file: UploadFile = File(...),
+    email: str = Form(...),
+    sample_fps: Optional[float] = Form(None),
+    line: Optional[str] = Form(None),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Track objects through a video file. Frames are decoded in a background
+    thread at `sample_fps`, detected through the shared inference scheduler
+    and tracked with ByteTrack; `line` ("x1,y1,x2,y2", 0-1) enables line
+    crossing counts. Counts as one analysis against the daily limit.
+    """
+    if email.lower() != (current_user.email or '').lower():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Email does not match authenticated user"
+        )
+
+    sample_fps = sample_fps or settings.VIDEO_SAMPLE_FPS
+    if not 0 < sample_fps <= settings.VIDEO_MAX_SAMPLE_FPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sample_fps must be in (0, {settings.VIDEO_MAX_SAMPLE_FPS}]"
+        )
+    counting_line = None
+    if line:
+        try:
+            counting_line = CountingLine.parse(line)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    suffix = os.path.splitext(file.filename or "")[1].lower()
+    if suffix not in VIDEO_EXTENSIONS:
+        suffix = ".mp4"
+
+    # Spool to disk now: the upload is closed once this handler returns
+    with stage_timer("upload_read"):
+        path = await run_io(_spool_video, file.file, suffix)
+
+    try:
+        with stage_timer("decode"):
+            readable = await run_io(probe_video, path)
+        if not readable:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is not a readable video"
+            )
+
+        with stage_timer("db_user"):
+            user = await db_service.get_user_by_email(email)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+        with stage_timer("db_usage"):
+            quota = await db_service.reserve_daily_usage(user.id, 1)
+        if quota["granted"] == 0:
+            if quota["reason"] == "no_subscription":
+                raise HTTPException(
+                    status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                    detail="Active subscription required. Please complete payment and wait for admin approval.",
+                )
+            if quota["reason"] == "busy":
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Usage counter is busy, please retry",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=(
+                    f"Daily analysis limit reached "
+                    f"({quota['used']}/{quota['limit']}). Resets at midnight UTC."
+                ),
+            )
+    except BaseException:
+        await run_io(os.remove, path)
+        raise
+
+    analysis = VideoAnalysis(path, scheduler.submit, sample_fps, line=counting_line)
+    return StreamingResponse(
+        _stream_video(analysis, path, quota, user, email),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _render_into_cache(heatmap_name: str) -> Optional[str]:
+    data = None
+    detection = await db_service.get_detection_by_heatmap_path(f"/api/heatmaps/{heatmap_name}")
+    if detection is not None and detection.boxes is not None:
+        image_key = media_storage.key_from_url(detection.imagePath)
+        if image_key is not None:
+            source = await run_io(media_storage.read, image_key)
+            data = await run_cpu(render_heatmap_bytes, source, stored_detections(detection)["box"])
+    if not data:
+        return None
+    return await run_io(heatmap_cache.put, heatmap_name, data)
+
+
+async def _render_cached_heatmap(heatmap_name: str) -> Optional[str]:
+    """Render a lazy heatmap into the cache, de-duplicating concurrent requests"""
+    task = _heatmap_renders.get(heatmap_name)
+    if task is None:
+        task = asyncio.ensure_future(_render_into_cache(heatmap_name))
+        _heatmap_renders[heatmap_name] = task
+        task.add_done_callback(lambda _: _heatmap_renders.pop(heatmap_name, None))
+    return await asyncio.shield(task)
+
+
+@router.get("/heatmaps/{heatmap_name}")
+async def get_heatmap(heatmap_name: str):
+    """Serve a heatmap, rendering and caching it on first request"""
+    if not HEATMAP_NAME_RE.match(heatmap_name):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Heatmap not found"
+        )
+
+    path = await run_io(heatmap_cache.get, heatmap_name) or await _render_cached_heatmap(heatmap_name)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Heatmap not found"
+        )
+    return FileResponse(path, media_type="image/jpeg")
+
+
+@router.get("/thumbnails/{detection_id}/{variant}")
+async def get_thumbnail(
+    detection_id: int,
+    variant: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Redirect to a history thumbnail ("original" or "heatmap"), rendering it on first request"""
+    if variant not in VARIANTS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Thumbnail not found"
+        )
+    user = await db_service.get_user_by_email(current_user.email or '')
+    detection = await db_service.get_detection_by_id(detection_id)
+    # Someone else's detection looks the same as a missing one
+    if not user or (detection and detection.userId != user.id):
+        detection = None
+    path = (await thumbnail_service.ensure(detection, (variant,)))[variant] if detection else None
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Thumbnail not found"
+        )
+    return RedirectResponse(media_storage.resolve_url(path), status_code=status.HTTP_302_FOUND)
+
+
+def _thumbnail_url(detection, variant: str) -> str:
+    """Stored thumbnail, or the endpoint that renders it on first view"""
+    path = detection.thumbnailPath if variant == "original" else detection.heatmapThumbnailPath
+    return media_storage.resolve_url(path) if path else f"/api/thumbnails/{detection.id}/{variant}"
+
+
 @router.get("/history", response_model=List[HistoryItem])
 async def get_history(
     email: str = Query(...),
@@ -162,9 +782,12 @@ async def get_history(
             id=d.id,
             object_name=d.objectName,
             advice=d.advice,
-            image_path=d.imagePath,
-            heatmap_path=d.heatmapPath,
-            created_at=d.createdAt.isoformat()
+            image_path=media_storage.resolve_url(d.imagePath),
+            heatmap_path=media_storage.resolve_url(d.heatmapPath),
+            thumbnail_url=_thumbnail_url(d, "original"),
+            heatmap_thumbnail_url=_thumbnail_url(d, "heatmap"),
+            created_at=d.createdAt.isoformat(),
+            detections=detected_objects(stored_detections(d), class_names),
         )
         for d in detections
     ]
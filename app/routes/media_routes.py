@@ -0,0 +1,215 @@
+"""
+Media Routes: stored originals, heatmaps and thumbnails at MEDIA_URL + "uploads/"
+
+Sharded media (ab/cd/<kind>_<id>.<ext>, where the id is a content hash or a
+random id) never changes once written, so it is cacheable forever and
+revalidation is a string compare. Flat files left over from before the
+sharded layout (input_<timestamp>.jpg, ...) were named by time and may be
+rewritten, so they get a short max-age and a weak ETag from size and mtime.
+How the bytes reach the client depends on the setup:
+
+- local storage, MEDIA_SERVE_MODE=direct: the file is streamed from the
+  API with Cache-Control, ETag and Last-Modified, answering conditional
+  requests with 304 and single byte ranges with 206.
+- local storage, MEDIA_SERVE_MODE=x-accel / x-sendfile: the response is a
+  header naming the file and the front proxy (nginx, Apache, lighttpd)
+  sends it, so no worker is tied up for the length of a download.
+- remote storage: a redirect to the object store.
+"""
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from stat import S_ISREG
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import RedirectResponse, Response
+
+from app.config import settings
+from app.services.executor import run_io
+from app.services.storage import IMMUTABLE_CACHE_CONTROL, media_storage
+
+router = APIRouter()
+
+# Read size when streaming a file from the API
+MEDIA_CHUNK_BYTES = 256 * 1024
+
+# Legacy flat files: cached briefly, then revalidated
+LEGACY_CACHE_CONTROL = "public, max-age=3600"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def is_sharded(key: str) -> bool:
+    """Whether `key` has the ab/cd/<kind>_<id>.<ext> layout of MediaStorage.key_for"""
+    parts = key.split("/")
+    if len(parts) != 3:
+        return False
+    media_id = os.path.splitext(parts[2])[0].partition("_")[2]
+    return len(parts[0]) == len(parts[1]) == 2 and media_id.startswith(parts[0] + parts[1])
+
+
+def media_etag(key: str) -> str:
+    """Strong ETag from a sharded key alone: the name already identifies the content"""
+    return '"' + os.path.splitext(key.rsplit("/", 1)[-1])[0] + '"'
+
+
+def legacy_etag(size: int, mtime: float) -> str:
+    """Weak ETag of a legacy flat file, which may be rewritten under the same name"""
+    return f'W/"{size:x}-{int(mtime):x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 prescribes for it)"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    [start, end) of a single "bytes=" range. None means serve the whole file
+    (no, malformed or multi-range header); ValueError means unsatisfiable.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end of the file")
+    return start, end
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    since = request.headers.get("if-modified-since")
+    if not since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class MediaFileResponse(Response):
+    """Streams bytes [start, end) of a file in MEDIA_CHUNK_BYTES reads on the I/O pool"""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers={**headers, "Content-Length": str(end - start)}, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        f = await run_io(open, self.path, "rb")
+        try:
+            await run_io(f.seek, self.start)
+            remaining = self.end - self.start
+            while remaining > 0:
+                chunk = await run_io(f.read, min(MEDIA_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # Truncated underneath us; end the body rather than hang the client
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_io(f.close)
+
+
+def _offload(key: str, path: str, media_type: str) -> Response:
+    """Headers only: the front proxy sends the file (and handles Range and revalidation)"""
+    if is_sharded(key):
+        headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": media_etag(key)}
+    else:
+        # No stat here; the proxy's own validators cover legacy files
+        headers = {"Cache-Control": LEGACY_CACHE_CONTROL}
+    if settings.MEDIA_SERVE_MODE == "x-sendfile":
+        headers["X-Sendfile"] = path
+    else:
+        headers["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + key
+    return Response(headers=headers, media_type=media_type)
+
+
+async def _serve_local(request: Request, key: str, path: str) -> Response:
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    if settings.MEDIA_SERVE_MODE in ("x-accel", "x-sendfile"):
+        return _offload(key, path, media_type)
+
+    try:
+        stat = await run_io(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        stat = None
+    if stat is None or not S_ISREG(stat.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    immutable = is_sharded(key)
+    etag = media_etag(key) if immutable else legacy_etag(stat.st_size, stat.st_mtime)
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else LEGACY_CACHE_CONTROL,
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = stat.st_size
+    # If-Range needs a strong match, so a weak ETag always gets the whole file
+    if_range = request.headers.get("if-range")
+    try:
+        byte_range = parse_range(request.headers.get("range"), size) if if_range is None or (immutable and if_range == etag) else None
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, "Content-Range": f"bytes */{size}"},
+        )
+    if byte_range is None:
+        return MediaFileResponse(path, 0, size, status.HTTP_200_OK, headers, media_type)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return MediaFileResponse(path, start, end, status.HTTP_206_PARTIAL_CONTENT, headers, media_type)
+
+
+@router.api_route(media_storage.url_prefix + "{key:path}", methods=["GET", "HEAD"])
+async def get_media(key: str, request: Request):
+    """
+    Stored media paths (saved in the database and linked from e-mails).
+    With a remote backend they redirect to the object store, so image bytes
+    never pass through the API.
+    """
+    if media_storage.root is None:
+        try:
+            url = media_storage.public_url(key)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+        # Cacheable for less time than the presigned URL stays valid
+        max_age = max(0, settings.S3_PRESIGN_SECONDS // 2)
+        return RedirectResponse(url, status_code=status.HTTP_302_FOUND, headers={"Cache-Control": f"private, max-age={max_age}"})
+    try:
+        path = media_storage.path(key)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+    return await _serve_local(request, key, path)
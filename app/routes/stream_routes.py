@@ -0,0 +1,96 @@
+"""
+Live Stream Routes: admin management and WebSocket result push
+"""
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+
+from app.models import MessageResponse, StreamCreateRequest, StreamInfo, TokenData
+from app.services.auth import require_admin, verify_token
+from app.services.streams import stream_manager
+
+router = APIRouter()
+
+
+def _get_stream(stream_id: str):
+    stream = stream_manager.get(stream_id)
+    if stream is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found")
+    return stream
+
+
+@router.post("/admin/streams", response_model=StreamInfo, status_code=status.HTTP_201_CREATED)
+async def add_stream(request: StreamCreateRequest, current_user: TokenData = Depends(require_admin)):
+    """Start ingesting an RTSP or HTTP MJPEG camera"""
+    try:
+        stream = stream_manager.add(request.url, request.name, request.target_fps, request.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamInfo(**stream.stats())
+
+
+@router.get("/admin/streams", response_model=List[StreamInfo])
+async def list_streams(current_user: TokenData = Depends(require_admin)):
+    """All streams of this process with achieved FPS and dropped frames"""
+    return [StreamInfo(**stream.stats()) for stream in stream_manager.streams.values()]
+
+
+@router.get("/admin/streams/{stream_id}", response_model=StreamInfo)
+async def get_stream(stream_id: str, current_user: TokenData = Depends(require_admin)):
+    return StreamInfo(**_get_stream(stream_id).stats())
+
+
+@router.delete("/admin/streams/{stream_id}", response_model=MessageResponse)
+async def remove_stream(stream_id: str, current_user: TokenData = Depends(require_admin)):
+    """Stop a stream and disconnect its subscribers"""
+    if not await stream_manager.remove(stream_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found")
+    return MessageResponse(message="Stream removed")
+
+
+@router.websocket("/streams/{stream_id}/ws")
+async def stream_results(websocket: WebSocket, stream_id: str, token: str = Query(...)):
+    """
+    Detections of one stream as JSON messages. Browsers can't set headers on
+    a WebSocket, so the JWT comes in the `token` query parameter.
+    """
+    try:
+        verify_token(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    stream = stream_manager.get(stream_id)
+    if stream is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    queue = stream.subscribe()
+
+    async def push():
+        await websocket.send_text(json.dumps({"type": "stream", **stream.stats()}))
+        while True:
+            message = await queue.get()
+            if message is None:
+                await websocket.close(code=status.WS_1001_GOING_AWAY)
+                return
+            await websocket.send_text(json.dumps(message))
+
+    async def drain():
+        # Incoming messages are ignored; receiving only notices the disconnect
+        while True:
+            await websocket.receive_text()
+
+    tasks = {asyncio.create_task(push()), asyncio.create_task(drain())}
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"⚠️  Stream {stream_id} subscriber failed: {error}")
+    finally:
+        stream.unsubscribe(queue)
+        for task in tasks:
+            task.cancel()
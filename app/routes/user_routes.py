@@ -7,6 +7,8 @@ from datetime import datetime, timedelta
 
 from app.models import UserProfile, UpdateProfile, StatsResponse, MessageResponse
 from app.database import db_service
+from app.services.inference import class_names
+from app.utils import stored_detections
 
 router = APIRouter()
 
@@ -79,6 +81,14 @@ async def get_stats(email: str = Query(...)):
     object_counts = Counter([d.objectName for d in detections])
     most_common = dict(object_counts.most_common(5))
 
+    # Every stored box, not just the headline label of each image
+    class_counts = Counter()
+    for d in detections:
+        packed = stored_detections(d)
+        if len(packed):
+            class_counts.update(packed["class_id"].tolist())
+    objects_by_class = {class_names.get(class_id, str(class_id)): count for class_id, count in class_counts.most_common()}
+
     # Detections by date (last 30 days for better analytics)
     today = datetime.now()
     date_counts = {}
@@ -92,5 +102,7 @@ async def get_stats(email: str = Query(...)):
         totalDetections=total_detections,
         mostCommonObjects=most_common,
         detectionsByDate=date_counts,
-        recentDetections=total_detections
+        recentDetections=total_detections,
+        totalObjects=sum(class_counts.values()),
+        objectsByClass=objects_by_class,
     )
@@ -0,0 +1,110 @@
+"""
+Advice cache keyed by detected label and prompt version
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Tuple
+
+from app.config import settings
+from app.database import db_service
+from app.services.advice_client import AdviceUnavailable, canned_advice
+from app.services.metrics import ADVICE_CACHE_HITS, ADVICE_CACHE_MISSES
+from app.utils import fetch_contextual_advice
+
+
+class AdviceCache:
+    """
+    Caches LLM advice per label.
+
+    Lookups go memory -> database -> provider. Entries expire after
+    `ttl_seconds`; concurrent misses for the same label share a single
+    upstream call. When the provider fails, canned advice is returned and
+    nothing is cached.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[str]],
+        db,
+        ttl_seconds: float,
+        prompt_version: str,
+    ):
+        self.fetch = fetch
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.prompt_version = prompt_version
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, label: str, advice: str, age_seconds: float = 0.0):
+        self._entries[label] = (advice, time.monotonic() + self.ttl_seconds - age_seconds)
+
+    async def get(self, label: str) -> str:
+        """Advice for `label`, from cache when fresh"""
+        entry = self._entries.get(label)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            ADVICE_CACHE_HITS.inc()
+            return entry[0]
+
+        self.misses += 1
+        ADVICE_CACHE_MISSES.inc()
+        task = self._inflight.get(label)
+        if task is None:
+            task = asyncio.ensure_future(self._load(label))
+            self._inflight[label] = task
+            task.add_done_callback(lambda _: self._inflight.pop(label, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, label: str) -> str:
+        try:
+            row = await self.db.get_cached_advice(label, self.prompt_version)
+        except Exception as e:
+            print(f"⚠️  Advice cache lookup failed: {e}")
+            row = None
+
+        if row is not None:
+            updated_at = row.updatedAt
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            age = (datetime.now(timezone.utc) - updated_at).total_seconds()
+            if age < self.ttl_seconds:
+                self._remember(label, row.advice, age)
+                return row.advice
+
+        try:
+            advice = await self.fetch(label)
+        except AdviceUnavailable as e:
+            print(f"⚠️  {e}; using canned advice")
+            return canned_advice(label)
+
+        self._remember(label, advice)
+        try:
+            await self.db.save_cached_advice(label, self.prompt_version, advice)
+        except Exception as e:
+            print(f"⚠️  Advice cache persist failed: {e}")
+        return advice
+
+    async def prewarm(self, labels: Iterable[str], concurrency: int = 4):
+        """Fill the cache for every label, a few provider calls at a time"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(label: str):
+            async with semaphore:
+                await self.get(label)
+
+        labels = list(labels)
+        await asyncio.gather(*(warm(label) for label in labels), return_exceptions=True)
+        print(f"✅ Advice cache prewarmed for {len(labels)} labels")
+
+
+# Shared cache instance
+advice_cache = AdviceCache(
+    fetch=fetch_contextual_advice,
+    db=db_service,
+    ttl_seconds=settings.ADVICE_CACHE_TTL_SECONDS,
+    prompt_version=settings.ADVICE_PROMPT_VERSION,
+)
@@ -0,0 +1,192 @@
+"""
+Pooled HTTP client for the advice provider (OpenRouter)
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+
+
+class AdviceUnavailable(Exception):
+    """Raised when the advice provider could not produce advice"""
+
+
+class CircuitOpenError(AdviceUnavailable):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+# Used when the provider is failing or the circuit is open
+CANNED_ADVICE = {
+    "person": "Pedestrian detected: drivers should slow down and yield, and planners should review crossing visibility and signal timing.",
+    "bicycle": "Cyclist detected: give at least 1.5 m of passing space and consider protected bike lanes on this route.",
+    "motorcycle": "Motorcycle detected: check blind spots carefully and keep a generous following distance.",
+    "car": "Vehicle detected: maintain a safe following distance and observe the posted speed limit.",
+    "bus": "Bus detected: watch for passengers at stops and avoid overtaking a stopped bus.",
+    "truck": "Truck detected: stay out of its blind spots and allow extra room when it turns.",
+    "traffic light": "Traffic signal detected: approach at a speed that lets you stop safely if it changes.",
+    "stop sign": "Stop sign detected: come to a complete stop and yield before proceeding.",
+    "Nothing detected": "No road users detected: stay alert, since conditions can change quickly.",
+}
+DEFAULT_CANNED_ADVICE = "Stay alert, reduce speed near hazards and keep a safe distance from other road users."
+
+
+def canned_advice(label: str) -> str:
+    return CANNED_ADVICE.get(label, DEFAULT_CANNED_ADVICE)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    Opens after `failure_threshold` failures, rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def release(self):
+        """Give back a trial slot whose call ended without a verdict (cancelled)"""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+class AdviceClient:
+    """
+    Keep-alive connection pool to the provider with connect/read timeouts,
+    bounded retries (exponential backoff, full jitter) and a circuit breaker.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.ADVICE_BREAKER_THRESHOLD,
+            reset_timeout=settings.ADVICE_BREAKER_RESET_SECONDS,
+        )
+
+    async def start(self):
+        """Open the shared connection pool"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=settings.OPENROUTER_BASE_URL,
+            timeout=httpx.Timeout(
+                settings.ADVICE_TIMEOUT_SECONDS,
+                connect=settings.ADVICE_CONNECT_TIMEOUT_SECONDS,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.ADVICE_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ADVICE_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def complete(self, prompt: str) -> str:
+        """Send a single-message chat completion and return the reply text"""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Advisor temporarily unavailable (circuit open)")
+        # Every way out must settle the breaker, or a half-open trial that
+        # ends in anything else keeps the circuit shut until a restart
+        try:
+            content = await self._complete(prompt)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return content
+
+    async def _complete(self, prompt: str) -> str:
+        """The request with retries; raises AdviceUnavailable when they run out"""
+        if self._client is None:
+            await self.start()
+
+        attempts = settings.ADVICE_MAX_RETRIES + 1
+        error = "unknown error"
+        for attempt in range(attempts):
+            if attempt:
+                backoff = settings.ADVICE_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, backoff))
+            try:
+                response = await self._client.post(
+                    "/chat/completions",
+                    headers={
+                        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
+                        "Content-Type": "application/json",
+                    },
+                    json={
+                        "model": settings.OPENROUTER_MODEL,
+                        "messages": [
+                            {"role": "user", "content": prompt}
+                        ]
+                    },
+                )
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+
+            if response.status_code == 200:
+                try:
+                    content = response.json()['choices'][0]['message']['content']
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    error = f"malformed response: {e}"
+                    break
+                if not isinstance(content, str):
+                    error = "malformed response: no message content"
+                    break
+                return content
+
+            error = f"Error: {response.status_code}"
+            if response.status_code not in self.RETRY_STATUSES:
+                break
+
+        raise AdviceUnavailable(f"Advisor currently unavailable ({error})")
+
+
+# Shared client, opened and closed by the application lifespan
+advice_client = AdviceClient()
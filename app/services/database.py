@@ -1,9 +1,9 @@
 """
 Database service for Prisma operations
 """
-from prisma import Prisma
+from prisma import Base64, Prisma
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import secrets
 
 from app.models import PLAN_DAILY_LIMIT
@@ -93,17 +93,43 @@ class DatabaseService:
         image_path: str,
         heatmap_path: str,
         user_id: int,
+        boxes: Optional[bytes] = None,
+        box_count: int = 0,
+        labels: Optional[List[str]] = None,
+        content_hash: Optional[str] = None,
+        perceptual_hash: Optional[int] = None,
+        model_key: Optional[str] = None,
     ):
-        """Create a new detection record"""
-        return await self.prisma.detection.create(
-            data={
-                "objectName": object_name,
-                "advice": advice,
-                "imagePath": image_path,
-                "heatmapPath": heatmap_path,
-                "userId": user_id,
-            }
-        )
+        """Create a new detection record; `boxes` is packed with utils.pack_detections"""
+        data = {
+            "objectName": object_name,
+            "advice": advice,
+            "imagePath": image_path,
+            "heatmapPath": heatmap_path,
+            "userId": user_id,
+            "boxCount": box_count,
+            "labels": labels or [],
+            "contentHash": content_hash,
+            "perceptualHash": perceptual_hash,
+            "modelKey": model_key,
+        }
+        if boxes is not None:
+            data["boxes"] = Base64.encode(boxes)
+        return await self.prisma.detection.create(data=data)
+
+    async def find_cached_detection(
+        self,
+        model_key: str,
+        content_hash: Optional[str] = None,
+        perceptual_hash: Optional[int] = None,
+    ):
+        """Latest detection of the same image content by the same model, if any"""
+        where = {"modelKey": model_key}
+        if content_hash is not None:
+            where["contentHash"] = content_hash
+        else:
+            where["perceptualHash"] = perceptual_hash
+        return await self.prisma.detection.find_first(where=where, order={"id": "desc"})
 
     async def get_detections(
         self,
@@ -116,7 +142,11 @@ class DatabaseService:
         where_clause = {"userId": user_id}
 
         if search:
-            where_clause["objectName"] = {"contains": search}
+            # Headline label, or any object detected in the image
+            where_clause["OR"] = [
+                {"objectName": {"contains": search}},
+                {"labels": {"has": search}},
+            ]
 
         if date_from or date_to:
             where_clause["createdAt"] = {}
@@ -134,10 +164,139 @@ class DatabaseService:
         """Get detection by ID"""
         return await self.prisma.detection.find_unique(where={"id": detection_id})
 
+    async def get_detection_by_heatmap_path(self, heatmap_path: str):
+        """Detection whose heatmap is served from `heatmap_path`"""
+        return await self.prisma.detection.find_first(where={"heatmapPath": heatmap_path})
+
+    async def set_detection_thumbnails(
+        self,
+        detection_id: int,
+        thumbnail_path: Optional[str],
+        heatmap_thumbnail_path: Optional[str],
+    ):
+        """Record the stored paths of a detection's thumbnails"""
+        return await self.prisma.detection.update(
+            where={"id": detection_id},
+            data={"thumbnailPath": thumbnail_path, "heatmapThumbnailPath": heatmap_thumbnail_path},
+        )
+
+    async def get_detections_without_thumbnails(self, after_id: int, limit: int) -> List:
+        """Detections missing either thumbnail, by ascending id (for backfills)"""
+        return await self.prisma.detection.find_many(
+            where={
+                "id": {"gt": after_id},
+                "OR": [{"thumbnailPath": None}, {"heatmapThumbnailPath": None}],
+            },
+            order={"id": "asc"},
+            take=limit,
+        )
+
     async def delete_detection(self, detection_id: int):
         """Delete a detection record"""
         return await self.prisma.detection.delete(where={"id": detection_id})
 
+    # ------------------------------------------------------------------ #
+    #  Advice cache operations                                             #
+    # ------------------------------------------------------------------ #
+
+    async def get_cached_advice(self, label: str, prompt_version: str):
+        """Get persisted advice for a label and prompt version"""
+        return await self.prisma.advicecache.find_unique(
+            where={"label_promptVersion": {"label": label, "promptVersion": prompt_version}}
+        )
+
+    async def save_cached_advice(self, label: str, prompt_version: str, advice: str):
+        """Insert or refresh persisted advice for a label and prompt version"""
+        return await self.prisma.advicecache.upsert(
+            where={"label_promptVersion": {"label": label, "promptVersion": prompt_version}},
+            data={
+                "create": {
+                    "label": label,
+                    "promptVersion": prompt_version,
+                    "advice": advice,
+                },
+                "update": {"advice": advice},
+            },
+        )
+
+    # ------------------------------------------------------------------ #
+    #  Email outbox operations                                             #
+    # ------------------------------------------------------------------ #
+
+    async def enqueue_email(self, to_email: str, subject: str, text_body: str, html_body: str):
+        """Queue an email for the background outbox worker"""
+        return await self.prisma.emailoutbox.create(
+            data={
+                "toEmail": to_email,
+                "subject": subject,
+                "textBody": text_body,
+                "htmlBody": html_body,
+            }
+        )
+
+    async def claim_due_emails(self, limit: int, stale_after: timedelta) -> List:
+        """
+        Claim emails that are due for delivery.
+        Rows are moved to SENDING one by one with a conditional update, so
+        several API workers can drain the same outbox without double sends.
+        SENDING rows whose claim is older than `stale_after` are reclaimed.
+        """
+        now = datetime.utcnow()
+        candidates = await self.prisma.emailoutbox.find_many(
+            where={
+                "OR": [
+                    {"status": "PENDING", "nextAttemptAt": {"lte": now}},
+                    {"status": "SENDING", "lockedAt": {"lt": now - stale_after}},
+                ]
+            },
+            order={"id": "asc"},
+            take=limit,
+        )
+
+        claimed = []
+        for row in candidates:
+            # lockedAt acts as the claim token: once another worker has
+            # (re)claimed a stale row, its lockedAt no longer matches
+            count = await self.prisma.emailoutbox.update_many(
+                where={"id": row.id, "status": row.status, "attempts": row.attempts, "lockedAt": row.lockedAt},
+                data={"status": "SENDING", "lockedAt": now},
+            )
+            if count:
+                claimed.append(row)
+        return claimed
+
+    async def mark_email_sent(self, email_id: int):
+        """Mark an outbox email as delivered"""
+        return await self.prisma.emailoutbox.update(
+            where={"id": email_id},
+            data={"status": "SENT", "sentAt": datetime.utcnow(), "lockedAt": None},
+        )
+
+    async def mark_email_retry(self, email_id: int, attempts: int, next_attempt_at: datetime, error: str):
+        """Record a failed delivery attempt and schedule the next one"""
+        return await self.prisma.emailoutbox.update(
+            where={"id": email_id},
+            data={
+                "status": "PENDING",
+                "attempts": attempts,
+                "nextAttemptAt": next_attempt_at,
+                "lastError": error[:1000],
+                "lockedAt": None,
+            },
+        )
+
+    async def mark_email_failed(self, email_id: int, attempts: int, error: str):
+        """Give up on an outbox email after the final attempt"""
+        return await self.prisma.emailoutbox.update(
+            where={"id": email_id},
+            data={
+                "status": "FAILED",
+                "attempts": attempts,
+                "lastError": error[:1000],
+                "lockedAt": None,
+            },
+        )
+
     # ------------------------------------------------------------------ #
     #  Subscription operations                                             #
     # ------------------------------------------------------------------ #
@@ -160,56 +319,74 @@ class DatabaseService:
         subscription = await self.get_active_subscription(user_id)
         return subscription is not None
 
-    async def check_and_increment_daily_usage(self, user_id: int) -> dict:
+    async def reserve_daily_usage(self, user_id: int, requested: int) -> dict:
         """
-        Check whether today's analysis count is within the daily limit.
-        Resets the counter automatically when a new UTC day starts.
-        Returns {"allowed": bool, "used": int, "limit": int, "reason": str|None}
+        Reserve up to `requested` analyses from today's quota in one step.
+        The counter is updated with a compare-and-set, and a new UTC day only
+        resets it if no other request has already done so, so concurrent
+        analyses (single, batch or video) never push it past the limit.
+        Returns {"granted": int, "used": int, "limit": int, "reason": str|None,
+        "day": date}; "day" is the UTC day the reservation counts against.
         """
         subscription = await self.get_active_subscription(user_id)
         if not subscription:
-            return {"allowed": False, "used": 0, "limit": 0, "reason": "no_subscription"}
-
-        today = datetime.utcnow().date()
-        last_used = subscription.lastUsageDate
-
-        # Reset counter if it's a new day
-        if last_used is None or last_used.date() < today:
-            await self.prisma.subscription.update(
-                where={"id": subscription.id},
-                data={
-                    "dailyUsedToday": 1,
-                    "lastUsageDate": datetime.utcnow(),
-                },
-            )
-            return {
-                "allowed": True,
-                "used": 1,
-                "limit": subscription.dailyLimit,
-                "reason": None,
-            }
-
-        # Check limit
-        if subscription.dailyUsedToday >= subscription.dailyLimit:
-            return {
-                "allowed": False,
-                "used": subscription.dailyUsedToday,
-                "limit": subscription.dailyLimit,
-                "reason": "daily_limit_reached",
-            }
+            return {"granted": 0, "used": 0, "limit": 0, "reason": "no_subscription"}
+
+        for _ in range(5):
+            today = datetime.utcnow().date()
+            last_used = subscription.lastUsageDate
+            limit = subscription.dailyLimit
+
+            if last_used is None or last_used.date() < today:
+                # First use today: start the counter at the reservation
+                used = 0
+                granted = min(requested, limit)
+                where = {"id": subscription.id, "lastUsageDate": last_used}
+                data = {"dailyUsedToday": granted, "lastUsageDate": datetime.utcnow()}
+            else:
+                used = subscription.dailyUsedToday
+                granted = max(0, min(requested, limit - used))
+                where = {"id": subscription.id, "dailyUsedToday": used}
+                data = {"dailyUsedToday": {"increment": granted}}
+
+            if granted == 0:
+                return {"granted": 0, "used": used, "limit": limit, "reason": "daily_limit_reached", "day": today}
+
+            if await self.prisma.subscription.update_many(where=where, data=data):
+                return {"granted": granted, "used": used + granted, "limit": limit, "reason": None, "day": today}
+
+            # Lost a race with another request; re-read and try again
+            subscription = await self.prisma.subscription.find_unique(where={"id": subscription.id})
 
-        # Increment
-        await self.prisma.subscription.update(
-            where={"id": subscription.id},
-            data={"dailyUsedToday": {"increment": 1}},
-        )
         return {
-            "allowed": True,
-            "used": subscription.dailyUsedToday + 1,
+            "granted": 0,
+            "used": subscription.dailyUsedToday,
             "limit": subscription.dailyLimit,
-            "reason": None,
+            "reason": "busy",
+            "day": datetime.utcnow().date(),
         }
 
+    async def release_daily_usage(self, user_id: int, count: int, day: date):
+        """
+        Give back reserved analyses that were not performed. `day` is the
+        reservation's "day"; once the counter has been reset for a later day
+        there is nothing left to give back.
+        """
+        if count <= 0:
+            return
+        subscription = await self.get_active_subscription(user_id)
+        if not subscription:
+            return
+        day_start = datetime.combine(day, datetime.min.time())
+        await self.prisma.subscription.update_many(
+            where={
+                "id": subscription.id,
+                "dailyUsedToday": {"gte": count},
+                "lastUsageDate": {"gte": day_start, "lt": day_start + timedelta(days=1)},
+            },
+            data={"dailyUsedToday": {"decrement": count}},
+        )
+
     async def get_user_api_key(self, user_id: int):
         """Get active API key for user"""
         now = datetime.utcnow()
@@ -0,0 +1,50 @@
+"""
+Detection result type
+
+Kept apart from app.services.inference, which loads the model on import, so
+that code only handling results (IPC, heatmaps, benchmarks) does not need
+the detector.
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+
+@dataclass
+class DetectionResult:
+    """
+    Output of a single detection pass.
+    Shared by the heatmap stage, label selection and persistence so the
+    model only runs once per image.
+    """
+    image: np.ndarray          # decoded BGR frame the boxes refer to
+    boxes: np.ndarray          # (N, 4) float32, xyxy in image pixels
+    confidences: np.ndarray    # (N,) float32
+    class_ids: np.ndarray      # (N,) int32
+    names: Dict[int, str]
+
+    def __len__(self) -> int:
+        return int(self.class_ids.shape[0])
+
+    @property
+    def primary_class_id(self) -> Optional[int]:
+        """Class of the most confident box, used as the headline label"""
+        return int(self.class_ids[int(np.argmax(self.confidences))]) if len(self) else None
+
+    @property
+    def label(self) -> str:
+        class_id = self.primary_class_id
+        return self.names[class_id] if class_id is not None else "Nothing detected"
+
+    @classmethod
+    def from_ultralytics(cls, result) -> "DetectionResult":
+        """Build from an ultralytics `Results` object"""
+        boxes = result.boxes
+        return cls(
+            image=result.orig_img,
+            boxes=boxes.xyxy.cpu().numpy().astype(np.float32),
+            confidences=boxes.conf.cpu().numpy().astype(np.float32),
+            class_ids=boxes.cls.cpu().numpy().astype(np.int32),
+            names=result.names,
+        )
@@ -1,187 +1,207 @@
 """
 Email Service
 """
+import asyncio
 import smtplib
+import time
+from datetime import datetime, timedelta
+from typing import Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from app.config import settings
+from app.database import db_service
+from app.services.executor import run_io
+from app.services.metrics import stage_timer
 
 
-async def send_detection_email(user_email: str, user_name: str, detected_object: str, advice: str, heatmap_url: str = None, original_url: str = None):
-    """Send email notification after successful image analysis"""
+DETECTION_EMAIL_SUBJECT = "🚦 Vision Flow AI - Image Analysis Complete"
 
-    if not settings.EMAIL_USERNAME or not settings.EMAIL_PASSWORD:
-        print("⚠️  Email credentials not configured, skipping email notification")
-        return False
 
-    try:
-        # Create message
-        message = MIMEMultipart("alternative")
-        message["Subject"] = "🚦 Vision Flow AI - Image Analysis Complete"
-        message["From"] = settings.DEFAULT_FROM_EMAIL
-        message["To"] = user_email
-
-        # HTML email content
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                }}
-                .container {{
-                    max-width: 600px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                .header {{
-                    background: linear-gradient(135deg, #0ea5e9 0%, #3b82f6 100%);
-                    color: white;
-                    padding: 30px;
-                    border-radius: 10px 10px 0 0;
-                    text-align: center;
-                }}
-                .content {{
-                    background: #f8fafc;
-                    padding: 30px;
-                    border: 1px solid #e2e8f0;
-                    border-top: none;
-                }}
-                .detection-box {{
-                    background: white;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin: 20px 0;
-                    border-left: 4px solid #0ea5e9;
-                }}
-                .advice-box {{
-                    background: #e0f2fe;
-                    padding: 15px;
-                    border-radius: 8px;
-                    margin-top: 15px;
-                }}
-                .image-box {{
-                    background: white;
-                    padding: 20px;
-                    border-radius: 8px;
-                    margin: 20px 0;
-                    text-align: center;
-                }}
-                .image-box img {{
-                    max-width: 100%;
-                    height: auto;
-                    border-radius: 8px;
-                    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-                    margin: 10px 0;
-                }}
-                .button {{
-                    display: inline-block;
-                    padding: 12px 30px;
-                    background: #0ea5e9;
-                    color: white;
-                    text-decoration: none;
-                    border-radius: 6px;
-                    margin-top: 20px;
-                }}
-                .footer {{
-                    text-align: center;
-                    padding: 20px;
-                    color: #64748b;
-                    font-size: 14px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>✅ Analysis Complete!</h1>
-                    <p>Your traffic image has been analyzed successfully</p>
+def render_detection_email(user_name: str, detected_object: str, advice: str, heatmap_url: str = None, original_url: str = None):
+    """Render the analysis notification as (subject, text, html)"""
+    # HTML email content
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                line-height: 1.6;
+                color: #333;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 0 auto;
+                padding: 20px;
+            }}
+            .header {{
+                background: linear-gradient(135deg, #0ea5e9 0%, #3b82f6 100%);
+                color: white;
+                padding: 30px;
+                border-radius: 10px 10px 0 0;
+                text-align: center;
+            }}
+            .content {{
+                background: #f8fafc;
+                padding: 30px;
+                border: 1px solid #e2e8f0;
+                border-top: none;
+            }}
+            .detection-box {{
+                background: white;
+                padding: 20px;
+                border-radius: 8px;
+                margin: 20px 0;
+                border-left: 4px solid #0ea5e9;
+            }}
+            .advice-box {{
+                background: #e0f2fe;
+                padding: 15px;
+                border-radius: 8px;
+                margin-top: 15px;
+            }}
+            .image-box {{
+                background: white;
+                padding: 20px;
+                border-radius: 8px;
+                margin: 20px 0;
+                text-align: center;
+            }}
+            .image-box img {{
+                max-width: 100%;
+                height: auto;
+                border-radius: 8px;
+                box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+                margin: 10px 0;
+            }}
+            .button {{
+                display: inline-block;
+                padding: 12px 30px;
+                background: #0ea5e9;
+                color: white;
+                text-decoration: none;
+                border-radius: 6px;
+                margin-top: 20px;
+            }}
+            .footer {{
+                text-align: center;
+                padding: 20px;
+                color: #64748b;
+                font-size: 14px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>✅ Analysis Complete!</h1>
+                <p>Your traffic image has been analyzed successfully</p>
+            </div>
+            <div class="content">
+                <p>Hi {user_name},</p>
+                <p>Your image analysis is complete. Here are the results:</p>
+
+                <div class="detection-box">
+                    <h2 style="margin-top: 0; color: #0ea5e9;">🎯 Detected Object</h2>
+                    <p style="font-size: 24px; font-weight: bold; margin: 10px 0; text-transform: capitalize;">
+                        {detected_object}
+                    </p>
                 </div>
-                <div class="content">
-                    <p>Hi {user_name},</p>
-                    <p>Your image analysis is complete. Here are the results:</p>
-
-                    <div class="detection-box">
-                        <h2 style="margin-top: 0; color: #0ea5e9;">🎯 Detected Object</h2>
-                        <p style="font-size: 24px; font-weight: bold; margin: 10px 0; text-transform: capitalize;">
-                            {detected_object}
-                        </p>
-                    </div>
 
-                    {f'''
-                    <div class="image-box">
-                        <h3 style="margin-top: 0; color: #475569;">📸 Analyzed Images</h3>
-                        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-top: 15px;">
-                            <div>
-                                <p style="font-weight: bold; color: #64748b; margin: 5px 0; font-size: 14px;">Original Image</p>
-                                <img src="http://localhost:8000{original_url}" alt="Original" style="max-width: 100%; border-radius: 8px;">
-                            </div>
-                            <div>
-                                <p style="font-weight: bold; color: #64748b; margin: 5px 0; font-size: 14px;">Heatmap Analysis</p>
-                                <img src="http://localhost:8000{heatmap_url}" alt="Heatmap" style="max-width: 100%; border-radius: 8px;">
-                            </div>
+                {f'''
+                <div class="image-box">
+                    <h3 style="margin-top: 0; color: #475569;">📸 Analyzed Images</h3>
+                    <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-top: 15px;">
+                        <div>
+                            <p style="font-weight: bold; color: #64748b; margin: 5px 0; font-size: 14px;">Original Image</p>
+                            <img src="http://localhost:8000{original_url}" alt="Original" style="max-width: 100%; border-radius: 8px;">
+                        </div>
+                        <div>
+                            <p style="font-weight: bold; color: #64748b; margin: 5px 0; font-size: 14px;">Heatmap Analysis</p>
+                            <img src="http://localhost:8000{heatmap_url}" alt="Heatmap" style="max-width: 100%; border-radius: 8px;">
                         </div>
                     </div>
-                    ''' if original_url and heatmap_url else ''}
-
-                    <div class="advice-box">
-                        <h3 style="margin-top: 0; color: #0369a1;">💡 AI Insights</h3>
-                        <p style="margin: 0;">{advice}</p>
-                    </div>
+                </div>
+                ''' if original_url and heatmap_url else ''}
 
-                    <div style="text-align: center;">
-                        <a href="http://localhost:3000/dashboard/history" class="button">
-                            View Full Analysis
-                        </a>
-                    </div>
+                <div class="advice-box">
+                    <h3 style="margin-top: 0; color: #0369a1;">💡 AI Insights</h3>
+                    <p style="margin: 0;">{advice}</p>
                 </div>
-                <div class="footer">
-                    <p>Vision Flow AI - Smart Traffic Detection</p>
-                    <p style="font-size: 12px; color: #94a3b8;">
-                        This is an automated email. Please do not reply.
-                    </p>
+
+                <div style="text-align: center;">
+                    <a href="http://localhost:3000/dashboard/history" class="button">
+                        View Full Analysis
+                    </a>
                 </div>
             </div>
-        </body>
-        </html>
-        """
+            <div class="footer">
+                <p>Vision Flow AI - Smart Traffic Detection</p>
+                <p style="font-size: 12px; color: #94a3b8;">
+                    This is an automated email. Please do not reply.
+                </p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
 
-        # Plain text version
-        text_content = f"""
-        Vision Flow AI - Analysis Complete
+    # Plain text version
+    text_content = f"""
+    Vision Flow AI - Analysis Complete
 
-        Hi {user_name},
+    Hi {user_name},
 
-        Your image analysis is complete!
+    Your image analysis is complete!
 
-        Detected Object: {detected_object}
+    Detected Object: {detected_object}
 
-        AI Insights:
-        {advice}
+    AI Insights:
+    {advice}
 
-        {f'View Images: http://localhost:8000{original_url} (Original) | http://localhost:8000{heatmap_url} (Heatmap)' if original_url and heatmap_url else ''}
+    {f'View Images: http://localhost:8000{original_url} (Original) | http://localhost:8000{heatmap_url} (Heatmap)' if original_url and heatmap_url else ''}
 
-        View your full analysis at: http://localhost:3000/dashboard/history
+    View your full analysis at: http://localhost:3000/dashboard/history
 
-        ---
-        Vision Flow AI - Smart Traffic Detection
-        This is an automated email. Please do not reply.
-        """
+    ---
+    Vision Flow AI - Smart Traffic Detection
+    This is an automated email. Please do not reply.
+    """
 
-        # Attach both versions
-        part1 = MIMEText(text_content, "plain")
-        part2 = MIMEText(html_content, "html")
-        message.attach(part1)
-        message.attach(part2)
+    return DETECTION_EMAIL_SUBJECT, text_content, html_content
 
-        # Send email
-        with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT) as server:
-            server.starttls()
-            server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
-            server.send_message(message)
+
+def build_message(to_email: str, subject: str, text_content: str, html_content: str) -> MIMEMultipart:
+    """Assemble a multipart/alternative message with plain and HTML parts"""
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = settings.DEFAULT_FROM_EMAIL
+    message["To"] = to_email
+
+    # Attach both versions
+    part1 = MIMEText(text_content, "plain")
+    part2 = MIMEText(html_content, "html")
+    message.attach(part1)
+    message.attach(part2)
+    return message
+
+
+async def send_detection_email(user_email: str, user_name: str, detected_object: str, advice: str, heatmap_url: str = None, original_url: str = None):
+    """Send email notification immediately over a fresh SMTP connection"""
+
+    if not settings.EMAIL_ENABLED:
+        print("⚠️  Email credentials not configured, skipping email notification")
+        return False
+
+    try:
+        subject, text_content, html_content = render_detection_email(
+            user_name, detected_object, advice, heatmap_url, original_url
+        )
+        message = build_message(user_email, subject, text_content, html_content)
+
+        # Send email on the I/O pool; smtplib blocks for the whole handshake
+        await run_io(_smtp_send, message)
 
         print(f"✅ Email sent successfully to {user_email}")
         return True
@@ -189,3 +209,168 @@ async def send_detection_email(user_email: str, user_name: str, detected_object:
     except Exception as e:
         print(f"❌ Failed to send email: {str(e)}")
         return False
+
+
+def _smtp_connect() -> smtplib.SMTP:
+    """Open and authenticate an SMTP connection (blocking)"""
+    if settings.EMAIL_USE_SSL:
+        server = smtplib.SMTP_SSL(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=settings.EMAIL_TIMEOUT_SECONDS)
+    else:
+        server = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=settings.EMAIL_TIMEOUT_SECONDS)
+        if settings.EMAIL_USE_TLS:
+            server.starttls()
+    if settings.EMAIL_USERNAME and settings.EMAIL_PASSWORD:
+        server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
+    return server
+
+
+def _smtp_send(message):
+    """Blocking SMTP delivery; call through run_io"""
+    with _smtp_connect() as server:
+        server.send_message(message)
+
+
+async def enqueue_detection_email(user_email: str, user_name: str, detected_object: str, advice: str, heatmap_url: str = None, original_url: str = None):
+    """Queue the analysis notification for the outbox worker"""
+
+    if not settings.EMAIL_ENABLED:
+        print("⚠️  Email credentials not configured, skipping email notification")
+        return False
+
+    subject, text_content, html_content = render_detection_email(
+        user_name, detected_object, advice, heatmap_url, original_url
+    )
+    await db_service.enqueue_email(user_email, subject, text_content, html_content)
+    email_outbox.wake()
+    return True
+
+
+class SMTPSession:
+    """
+    One long-lived SMTP connection, reused across messages.
+    Reconnects when the server has dropped it or it sat idle too long.
+    Blocking; drive it from a single task through run_io.
+    """
+
+    def __init__(self, idle_check_seconds: float = 30.0):
+        self.idle_check_seconds = idle_check_seconds
+        self._server = None
+        self._last_used = 0.0
+
+    def _alive(self) -> bool:
+        if self._server is None:
+            return False
+        if time.monotonic() - self._last_used < self.idle_check_seconds:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, message):
+        if not self._alive():
+            self.close()
+            self._server = _smtp_connect()
+        try:
+            self._server.send_message(message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Connection went away mid-session: reconnect once and retry
+            self.close()
+            self._server = _smtp_connect()
+            self._server.send_message(message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+
+class EmailOutbox:
+    """
+    Background worker that drains the EmailOutbox table over one
+    persistent SMTP session, retrying failures with exponential backoff.
+    """
+
+    def __init__(self):
+        self.session = SMTPSession()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and settings.EMAIL_ENABLED:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await run_io(self.session.close)
+
+    def wake(self):
+        """Signal that new mail was queued"""
+        self._wake.set()
+
+    def _backoff(self, attempts: int) -> timedelta:
+        seconds = settings.EMAIL_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        return timedelta(seconds=min(seconds, settings.EMAIL_RETRY_MAX_SECONDS))
+
+    async def _deliver(self, row):
+        message = build_message(row.toEmail, row.subject, row.textBody, row.htmlBody)
+        try:
+            with stage_timer("email_send"):
+                await run_io(self.session.send, message)
+        except Exception as e:
+            attempts = row.attempts + 1
+            error = f"{type(e).__name__}: {e}"
+            if attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                print(f"❌ Email {row.id} to {row.toEmail} failed permanently: {error}")
+                await db_service.mark_email_failed(row.id, attempts, error)
+            else:
+                await db_service.mark_email_retry(
+                    row.id, attempts, datetime.utcnow() + self._backoff(attempts), error
+                )
+            return
+        await db_service.mark_email_sent(row.id)
+        print(f"✅ Email sent successfully to {row.toEmail}")
+
+    async def drain(self) -> int:
+        """Deliver every email that is currently due; returns how many were claimed"""
+        total = 0
+        while True:
+            rows = await db_service.claim_due_emails(
+                limit=settings.EMAIL_OUTBOX_BATCH_SIZE,
+                stale_after=timedelta(seconds=settings.EMAIL_OUTBOX_STALE_SECONDS),
+            )
+            if not rows:
+                return total
+            total += len(rows)
+            for row in rows:
+                await self._deliver(row)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Email outbox error: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.EMAIL_OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Shared outbox worker, started by the application lifespan
+email_outbox = EmailOutbox()
@@ -0,0 +1,40 @@
+"""
+Execution layer for blocking work
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import settings
+
+# CPU-bound stages (OpenVINO inference, OpenCV/NumPy heatmaps). These
+# libraries release the GIL in their hot loops, so threads give real
+# parallelism without pickling frames across process boundaries.
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_POOL_WORKERS,
+    thread_name_prefix="vf-cpu",
+)
+
+# Blocking network clients that have no asyncio API (smtplib).
+io_executor = ThreadPoolExecutor(
+    max_workers=settings.IO_POOL_WORKERS,
+    thread_name_prefix="vf-io",
+)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Run a CPU-bound callable on the CPU pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking I/O callable on the I/O pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Wait for in-flight work and release the pools"""
+    cpu_executor.shutdown(wait=True)
+    io_executor.shutdown(wait=True)
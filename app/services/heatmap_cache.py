@@ -0,0 +1,105 @@
+"""
+On-demand heatmap rendering with a size-bounded disk cache
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.services.heatmap import render_heatmap
+
+
+class HeatmapCache:
+    """
+    LRU cache of rendered heatmap JPEGs on local disk.
+    The index is rebuilt from file mtimes on start-up, so recency survives
+    restarts; hits refresh the mtime.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._total += size
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[str]:
+        """Path of a cached heatmap, or None on a miss (blocking: refreshes the mtime)"""
+        with self._lock:
+            if name not in self._index:
+                return None
+            self._index.move_to_end(name)
+        path = self.path_for(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._total -= self._index.pop(name, 0)
+            return None
+        return path
+
+    def put(self, name: str, data: bytes) -> str:
+        """Store a rendered heatmap atomically and evict least recently used entries"""
+        path = self.path_for(name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total -= self._index.pop(name, 0)
+            self._index[name] = len(data)
+            self._total += len(data)
+            evicted = []
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_name, old_size = self._index.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_name)
+
+        for old_name in evicted:
+            try:
+                os.remove(self.path_for(old_name))
+            except FileNotFoundError:
+                pass
+        return path
+
+
+def encode_heatmap(image: np.ndarray, boxes: np.ndarray) -> Optional[bytes]:
+    """Heatmap overlay of a decoded image as JPEG bytes (blocking)"""
+    ok, encoded = cv2.imencode(".jpg", render_heatmap(image, boxes))
+    return encoded.tobytes() if ok else None
+
+
+def render_heatmap_bytes(data: Optional[bytes], boxes: np.ndarray) -> Optional[bytes]:
+    """Render the heatmap of an encoded image (e.g. read from media storage), or None if it is missing (blocking)"""
+    if not data:
+        return None
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return encode_heatmap(image, boxes)
+
+
+# Shared cache instance
+heatmap_cache = HeatmapCache(settings.HEATMAP_CACHE_DIR, settings.HEATMAP_CACHE_MAX_BYTES)
@@ -0,0 +1,110 @@
+"""
+Inference Service
+"""
+from typing import Dict, List
+import os
+import time
+
+from app.config import settings
+from app.services.detection_types import DetectionResult
+from app.services.executor import cpu_executor
+from app.services.metrics import MODEL_LOAD_SECONDS
+from app.services.model_metadata import read_model_metadata
+from app.services.scheduler import InferenceScheduler
+
+
+def run_detection(model, source) -> DetectionResult:
+    """Run the detector once on `source` (path or BGR ndarray)"""
+    results = model.predict(source=source, device='cpu', conf=settings.CONFIDENCE_THRESHOLD)
+    return DetectionResult.from_ultralytics(results[0])
+
+
+def run_detection_batch(model, sources: List) -> List[DetectionResult]:
+    """Run the detector once over a batch of sources, one result per source"""
+    results = model.predict(
+        source=list(sources),
+        device='cpu',
+        conf=settings.CONFIDENCE_THRESHOLD,
+        verbose=False,
+    )
+    return [DetectionResult.from_ultralytics(r) for r in results]
+
+
+model_metadata = read_model_metadata(settings.YOLO_MODEL_PATH)
+
+# Class names of the configured model, for class ids read back from the database
+class_names: Dict[int, str] = {int(k): v for k, v in model_metadata.get("names", {}).items()}
+
+# What produced a stored result; cached results are only reused for the same key
+MODEL_KEY = ":".join([
+    settings.INFERENCE_BACKEND,
+    os.path.basename(os.path.normpath(settings.YOLO_MODEL_PATH)),
+    str(model_metadata.get("date", "")),
+    f"conf={settings.CONFIDENCE_THRESHOLD}",
+])
+
+
+def max_supported_batch(model_path: str, requested: int) -> int:
+    """
+    Clamp the requested batch size to what the exported model accepts.
+    Static exports (`dynamic: false`) only take their fixed `batch`.
+    """
+    metadata = read_model_metadata(model_path)
+    args = metadata.get("args", {})
+    if args.get("dynamic"):
+        return requested
+    static_batch = int(metadata.get("batch", args.get("batch", 1)) or 1)
+    if requested > static_batch:
+        print(
+            f"⚠️  {model_path} is a static batch-{static_batch} export; "
+            f"micro-batching limited to {static_batch}. Re-export with scripts/export_model.py --dynamic."
+        )
+    return min(requested, static_batch)
+
+
+if settings.INFERENCE_MODE == "server":
+    # The model lives in app.inference_server; this worker never loads it
+    from app.services.inference_ipc import RemoteInferenceClient
+
+    model = None
+    scheduler = RemoteInferenceClient(
+        settings.INFERENCE_SERVER_SOCKET,
+        names=class_names,
+    )
+elif settings.INFERENCE_BACKEND == "openvino":
+    from app.services.openvino_backend import OpenVINODetector
+
+    # Native OpenVINO runtime; each image is its own infer request, so the
+    # batch size is not limited by the IR's static batch dimension. The IR is
+    # compiled on the first prediction (after gunicorn's fork), which also
+    # records the load time.
+    model = OpenVINODetector(
+        settings.YOLO_MODEL_PATH,
+        conf_threshold=settings.CONFIDENCE_THRESHOLD,
+        device=settings.OPENVINO_DEVICE,
+        performance_hint=settings.OPENVINO_PERFORMANCE_HINT,
+        num_streams=settings.OPENVINO_NUM_STREAMS,
+        infer_requests=settings.OPENVINO_INFER_REQUESTS,
+    )
+    scheduler = InferenceScheduler(
+        infer_batch=model.predict_batch,
+        max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+        executor=cpu_executor,
+    )
+else:
+    from ultralytics import YOLO
+
+    # Initialize YOLO model (ultralytics compiles the IR on the first predict,
+    # so that part shows up in the first inference stage sample instead)
+    load_start = time.perf_counter()
+    model = YOLO(settings.YOLO_MODEL_PATH, task="detect")
+    MODEL_LOAD_SECONDS.labels(backend="ultralytics").set(time.perf_counter() - load_start)
+
+    # Shared micro-batching scheduler in front of the model
+    scheduler = InferenceScheduler(
+        infer_batch=lambda sources: run_detection_batch(model, sources),
+        max_batch_size=max_supported_batch(settings.YOLO_MODEL_PATH, settings.INFERENCE_MAX_BATCH_SIZE),
+        max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+        executor=cpu_executor,
+    )
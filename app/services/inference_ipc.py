@@ -0,0 +1,110 @@
+"""
+IPC between API workers and the standalone inference server.
+
+Frames travel through POSIX shared memory; only a small JSON header
+(segment name, shape, dtype) and the detections cross the Unix socket, so
+multi-megabyte images are never pickled or copied through the kernel.
+"""
+import asyncio
+import json
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.services.detection_types import DetectionResult
+
+_LENGTH = struct.Struct("!I")
+
+
+async def send_message(writer: asyncio.StreamWriter, payload: dict):
+    body = json.dumps(payload).encode()
+    writer.write(_LENGTH.pack(len(body)) + body)
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[dict]:
+    """Next framed message, or None when the peer closed the connection"""
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+        body = await reader.readexactly(_LENGTH.unpack(header)[0])
+    except asyncio.IncompleteReadError:
+        return None
+    return json.loads(body)
+
+
+def read_shared_frame(name: str, shape, dtype: str) -> np.ndarray:
+    """Copy a frame out of a client's shared memory segment and detach"""
+    segment = shared_memory.SharedMemory(name=name)
+    # The client owns and unlinks the segment; stop this process's resource
+    # tracker from unlinking it again at exit.
+    resource_tracker.unregister(segment._name, "shared_memory")
+    try:
+        return np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf).copy()
+    finally:
+        segment.close()
+
+
+def encode_result(result: DetectionResult) -> dict:
+    return {
+        "boxes": result.boxes.tolist(),
+        "confidences": result.confidences.tolist(),
+        "class_ids": result.class_ids.tolist(),
+    }
+
+
+class RemoteInferenceClient:
+    """
+    Drop-in replacement for InferenceScheduler that forwards frames to the
+    inference server. Batching happens in the server, across all workers.
+    """
+
+    def __init__(self, socket_path: str, names: Dict[int, str]):
+        self.socket_path = socket_path
+        self.names = names
+        self._in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._in_flight
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def submit(self, image: np.ndarray) -> DetectionResult:
+        frame = np.ascontiguousarray(image)
+        segment = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+        self._in_flight += 1
+        try:
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=segment.buf)[...] = frame
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            try:
+                await send_message(writer, {
+                    "shm": segment.name,
+                    "shape": list(frame.shape),
+                    "dtype": frame.dtype.str,
+                })
+                reply = await read_message(reader)
+            finally:
+                writer.close()
+        finally:
+            self._in_flight -= 1
+            segment.close()
+            segment.unlink()
+
+        if reply is None:
+            raise RuntimeError("Inference server closed the connection")
+        if "error" in reply:
+            raise RuntimeError(f"Inference server error: {reply['error']}")
+
+        return DetectionResult(
+            image=image,
+            boxes=np.asarray(reply["boxes"], dtype=np.float32).reshape(-1, 4),
+            confidences=np.asarray(reply["confidences"], dtype=np.float32),
+            class_ids=np.asarray(reply["class_ids"], dtype=np.int32),
+            names=self.names,
+        )
@@ -0,0 +1,164 @@
+"""
+Prometheus metrics
+
+Stage histograms, per-route request counters, inference queue depth,
+advice cache lookups and model load time, exposed on GET /metrics.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory
+so every worker's samples are aggregated (gunicorn.conf.py cleans up after
+exited workers).
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Stages run from ~1 ms (label, enqueue) to seconds (4K inference, slow provider)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "visionflow_stage_seconds",
+    "Duration of individual analysis pipeline stages",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+HTTP_REQUESTS = Counter(
+    "visionflow_http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "visionflow_http_request_seconds",
+    "HTTP request duration by route template",
+    ["method", "route"],
+    buckets=STAGE_BUCKETS,
+)
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "visionflow_inference_queue_depth",
+    "Images waiting for or in inference (sampled at scrape time)",
+    multiprocess_mode="livesum",
+)
+ADVICE_CACHE_LOOKUPS = Counter(
+    "visionflow_advice_cache_lookups_total",
+    "Advice cache lookups; hit rate = hit / (hit + miss)",
+    ["result"],
+)
+RESULT_CACHE_LOOKUPS = Counter(
+    "visionflow_result_cache_lookups_total",
+    "Analyses answered from an earlier result of the same image (hit) or run in full (miss)",
+    ["result"],
+)
+UPLOADS_REJECTED = Counter(
+    "visionflow_uploads_rejected_total",
+    "Uploads refused before decode: too_large (bytes), too_many_pixels (header) or invalid (format)",
+    ["reason"],
+)
+MODEL_LOAD_SECONDS = Gauge(
+    "visionflow_model_load_seconds",
+    "Time taken to load (OpenVINO: compile) the detection model",
+    ["backend"],
+    multiprocess_mode="max",
+)
+
+ADVICE_CACHE_HITS = ADVICE_CACHE_LOOKUPS.labels(result="hit")
+ADVICE_CACHE_MISSES = ADVICE_CACHE_LOOKUPS.labels(result="miss")
+RESULT_CACHE_HITS = RESULT_CACHE_LOOKUPS.labels(result="hit")
+RESULT_CACHE_MISSES = RESULT_CACHE_LOOKUPS.labels(result="miss")
+
+# Pre-bound children so the hot path skips the label lookup
+_stage_children = {}
+
+# Stage durations of the current request, set by ServerTimingMiddleware.
+# Child tasks inherit the same dict, so stages run there are reported too.
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_SECONDS.labels(stage=stage)
+    child.observe(seconds)
+
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+class stage_timer:
+    """
+    Time a pipeline stage into visionflow_stage_seconds:
+
+        with stage_timer("decode"):
+            image = await run_cpu(decode_image, data)
+    """
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def _route_label(scope) -> str:
+    """Route template (e.g. /api/history/{item_id}) so ids don't explode cardinality"""
+    # Media paths are a templated route too (/media/uploads/{key:path}); the
+    # app has no mounts left, so anything without a route matched nothing
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware counting requests per route and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = _route_label(scope)
+            HTTP_REQUESTS.labels(scope["method"], route, status_code).inc()
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start)
+
+
+def render_metrics(queue_depth: int):
+    """Exposition payload and content type for GET /metrics"""
+    INFERENCE_QUEUE_DEPTH.set(queue_depth)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,44 @@
+"""
+Model metadata and input preprocessing
+
+Kept apart from app.services.inference, which loads the model on import, so
+that offline tools (quantization, benchmarks) and the OpenVINO backend can
+read an export and prepare its inputs without starting the detector.
+"""
+import os
+from typing import Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+
+def read_model_metadata(model_path: str) -> dict:
+    """Load the ultralytics export metadata that sits next to the IR"""
+    metadata_path = os.path.join(model_path, "metadata.yaml")
+    if not os.path.exists(metadata_path):
+        return {}
+    with open(metadata_path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int], color: int = 114) -> np.ndarray:
+    """Resize keeping aspect ratio and pad to `new_shape` (h, w), centred"""
+    shape = image.shape[:2]
+    r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+    new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+    dw = (new_shape[1] - new_unpad[0]) / 2
+    dh = (new_shape[0] - new_unpad[1]) / 2
+
+    if shape[::-1] != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    return cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color,) * 3)
+
+
+def preprocess(image: np.ndarray, input_hw: Tuple[int, int]) -> np.ndarray:
+    """BGR HWC uint8 -> letterboxed RGB NCHW float32 in [0, 1]"""
+    padded = letterbox(image, input_hw)
+    tensor = padded[..., ::-1].transpose(2, 0, 1)[None]
+    return np.ascontiguousarray(tensor, dtype=np.float32) / 255.0
@@ -0,0 +1,187 @@
+"""
+Native OpenVINO inference backend
+
+Loads the exported IR directly with openvino.Core and reproduces the
+ultralytics detect pipeline (letterbox, decode, class-aware NMS, box
+rescaling) in vectorized NumPy, so results match `results[0].boxes`
+without the wrapper's per-call Python overhead.
+"""
+import glob
+import os
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import openvino as ov
+
+from app.services.detection_types import DetectionResult
+from app.services.metrics import MODEL_LOAD_SECONDS
+from app.services.model_metadata import preprocess, read_model_metadata
+
+# Offset added per class so one NMS pass never suppresses across classes
+MAX_WH = 7680
+MAX_NMS = 30000
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy NMS; returns kept indices in descending score order"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(
+    output: np.ndarray,
+    input_hw: Tuple[int, int],
+    orig_hw: Tuple[int, int],
+    conf_threshold: float,
+    iou_threshold: float = 0.7,
+    max_det: int = 300,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode one (4 + nc, anchors) YOLO output into xyxy boxes, confidences
+    and class ids in original image pixels, sorted by confidence.
+    """
+    preds = output.T  # (anchors, 4 + nc)
+    scores_all = preds[:, 4:]
+    class_ids = scores_all.argmax(1)
+    conf = scores_all[np.arange(preds.shape[0]), class_ids]
+    keep = conf > conf_threshold
+    if not keep.any():
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32)
+
+    xywh, conf, class_ids = preds[keep, :4], conf[keep], class_ids[keep]
+    boxes = np.empty_like(xywh)
+    half_w, half_h = xywh[:, 2] / 2, xywh[:, 3] / 2
+    boxes[:, 0] = xywh[:, 0] - half_w
+    boxes[:, 1] = xywh[:, 1] - half_h
+    boxes[:, 2] = xywh[:, 0] + half_w
+    boxes[:, 3] = xywh[:, 1] + half_h
+
+    if conf.shape[0] > MAX_NMS:
+        top = np.argsort(-conf, kind="stable")[:MAX_NMS]
+        boxes, conf, class_ids = boxes[top], conf[top], class_ids[top]
+
+    offsets = class_ids[:, None].astype(np.float32) * MAX_WH
+    kept = nms(boxes + offsets, conf, iou_threshold)[:max_det]
+    boxes, conf, class_ids = boxes[kept], conf[kept], class_ids[kept]
+
+    # Undo the letterbox exactly like scale_boxes in the pinned ultralytics: one uniform
+    # gain and the padding of the unrounded resize, then clip
+    gain = min(input_hw[0] / orig_hw[0], input_hw[1] / orig_hw[1])
+    pad_x = round((input_hw[1] - orig_hw[1] * gain) / 2 - 0.1)
+    pad_y = round((input_hw[0] - orig_hw[0] * gain) / 2 - 0.1)
+    boxes[:, [0, 2]] -= pad_x
+    boxes[:, [1, 3]] -= pad_y
+    boxes /= gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, orig_hw[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, orig_hw[0])
+
+    return boxes.astype(np.float32), conf.astype(np.float32), class_ids.astype(np.int32)
+
+
+class OpenVINODetector:
+    """
+    YOLO detector on the OpenVINO runtime.
+    Images in a batch are submitted as independent infer requests to an
+    AsyncInferQueue, so a static batch-1 IR still uses every stream the
+    performance hint configures.
+
+    The IR is compiled on the first prediction, not at construction: with
+    gunicorn's preload_app the detector is built in the master, and the
+    runtime's thread pools must only be created after the fork.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        conf_threshold: float,
+        device: str = "CPU",
+        performance_hint: str = "LATENCY",
+        num_streams: Optional[str] = None,
+        infer_requests: int = 0,
+        iou_threshold: float = 0.7,
+        max_det: int = 300,
+    ):
+        xml_files = sorted(glob.glob(os.path.join(model_path, "*.xml"))) if os.path.isdir(model_path) else [model_path]
+        if not xml_files:
+            raise FileNotFoundError(f"No OpenVINO IR (*.xml) found in {model_path}")
+
+        metadata = read_model_metadata(os.path.dirname(xml_files[0]))
+        self.names = {int(k): v for k, v in metadata.get("names", {}).items()}
+        self.input_hw = tuple(int(v) for v in metadata.get("imgsz", [640, 640]))
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+        self.xml_path = xml_files[0]
+        self.device = device
+        self.config = {"PERFORMANCE_HINT": performance_hint.upper()}
+        if num_streams:
+            self.config["NUM_STREAMS"] = num_streams
+        self.infer_requests = infer_requests
+        self.compiled = None
+        self.queue = None
+        self._compile_lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+
+    def _ensure_compiled(self):
+        if self.queue is not None:
+            return
+        with self._compile_lock:
+            if self.queue is not None:
+                return
+            load_start = time.perf_counter()
+            core = ov.Core()
+            model = core.read_model(self.xml_path)
+            if model.input(0).get_partial_shape().is_dynamic:
+                model.reshape({model.input(0): [1, 3, *self.input_hw]})
+            self.compiled = core.compile_model(model, self.device, self.config)
+
+            jobs = self.infer_requests or self.compiled.get_property("OPTIMAL_NUMBER_OF_INFER_REQUESTS")
+            queue = ov.AsyncInferQueue(self.compiled, int(jobs))
+            queue.set_callback(self._on_done)
+            self.queue = queue
+            MODEL_LOAD_SECONDS.labels(backend="openvino").set(time.perf_counter() - load_start)
+
+    @staticmethod
+    def _on_done(request, userdata: Tuple[List[Optional[np.ndarray]], int]):
+        outputs, index = userdata
+        outputs[index] = request.get_output_tensor(0).data[0].copy()
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[DetectionResult]:
+        """Run every image through the infer queue; one result per image, in order"""
+        self._ensure_compiled()
+        # The scheduler, live streams and video analysis share the detector, so
+        # batches from several threads can be in the queue at once: each call
+        # collects into its own list, and submissions are serialized because
+        # the queue's pick of an idle request is not thread-safe
+        outputs: List[Optional[np.ndarray]] = [None] * len(images)
+        tensors = [preprocess(image, self.input_hw) for image in images]
+        with self._submit_lock:
+            for index, tensor in enumerate(tensors):
+                self.queue.start_async({0: tensor}, (outputs, index))
+        self.queue.wait_all()
+
+        results = []
+        for image, output in zip(images, outputs):
+            boxes, conf, class_ids = postprocess(
+                output, self.input_hw, image.shape[:2],
+                self.conf_threshold, self.iou_threshold, self.max_det,
+            )
+            results.append(DetectionResult(
+                image=image, boxes=boxes, confidences=conf, class_ids=class_ids, names=self.names,
+            ))
+        return results
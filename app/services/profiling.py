@@ -0,0 +1,136 @@
+"""
+Server-Timing headers and opt-in per-request profiling
+
+Requests under SERVER_TIMING_PATHS get a `Server-Timing` header with the
+stage durations recorded by stage_timer. An admin can add PROFILE_HEADER
+(default `X-Debug-Profile: 1`) to one of those requests to capture a
+pyinstrument profile of it; the response carries `X-Profile-Id`, and the
+HTML report is downloadable from GET /api/admin/profiles/{id}.
+
+Requests without the header never import or start the profiler.
+"""
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+from app.services.auth import verify_token
+from app.services.executor import run_io
+from app.services.metrics import request_timings
+
+PROFILE_NAME_RE = re.compile(r"^[0-9]{8}T[0-9]{12}_[0-9a-f]{8}\.html$")
+
+
+def format_server_timing(timings: Dict[str, float], total: float) -> str:
+    """`decode;dur=3.1, inference;dur=42.0, total;dur=80.2` (milliseconds)"""
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def _is_admin(scope) -> bool:
+    authorization = _header(scope, b"authorization")
+    if not authorization or not authorization.lower().startswith(b"bearer "):
+        return False
+    try:
+        return verify_token(authorization[7:].decode("latin-1").strip()).role == "ADMIN"
+    except HTTPException:
+        return False
+
+
+def profile_path(name: str) -> str:
+    return os.path.join(settings.PROFILES_DIR, name)
+
+
+def save_profile(profiler, name: str, method: str, path: str):
+    """Write the HTML report and keep only the newest PROFILES_KEEP reports"""
+    os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+    with open(profile_path(name), "w", encoding="utf-8") as f:
+        f.write(profiler.output_html())
+    print(f"✅ Profile of {method} {path} saved as {name}")
+
+    reports = sorted(f for f in os.listdir(settings.PROFILES_DIR) if PROFILE_NAME_RE.match(f))
+    for old in reports[:-settings.PROFILES_KEEP]:
+        try:
+            os.remove(profile_path(old))
+        except OSError:
+            pass
+
+
+def list_profiles() -> List[dict]:
+    """Saved reports, newest first"""
+    if not os.path.isdir(settings.PROFILES_DIR):
+        return []
+    items = []
+    for name in sorted(os.listdir(settings.PROFILES_DIR), reverse=True):
+        if not PROFILE_NAME_RE.match(name):
+            continue
+        stat = os.stat(profile_path(name))
+        items.append({
+            "name": name,
+            "size_bytes": stat.st_size,
+            "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+        })
+    return items
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware; requests outside `paths` pass straight through"""
+
+    def __init__(self, app, paths=None, profile_header: Optional[str] = None):
+        self.app = app
+        self.paths = tuple(paths if paths is not None else settings.SERVER_TIMING_PATHS)
+        self.profile_header = (profile_header or settings.PROFILE_HEADER).lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = None
+        profile_name = None
+        flag = _header(scope, self.profile_header)
+        if flag and flag not in (b"0", b"false") and _is_admin(scope):
+            from pyinstrument import Profiler
+
+            profile_name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}_{uuid.uuid4().hex[:8]}.html"
+            profiler = Profiler(interval=settings.PROFILE_INTERVAL_SECONDS, async_mode="enabled")
+
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", format_server_timing(timings, time.perf_counter() - start))
+                headers.append("Timing-Allow-Origin", "*")
+                if profile_name:
+                    headers.append("X-Profile-Id", profile_name)
+            await send(message)
+
+        if profiler is not None:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            if profiler is not None:
+                profiler.stop()
+                try:
+                    await run_io(save_profile, profiler, profile_name, scope["method"], scope["path"])
+                except Exception as e:
+                    print(f"⚠️  Failed to save profile {profile_name}: {e}")
@@ -0,0 +1,327 @@
+"""
+Media storage
+
+Uploaded originals and rendered heatmaps are stored under two-level sharded
+keys, `ab/cd/<kind>_<id>.jpg`, where `abcd` are the first characters of the
+id. Ids are random (uuid4) or content hashes, so shards fill evenly and no
+directory (or object-store prefix) grows without bound.
+
+STORAGE_BACKEND selects where the bytes live:
+
+- "local": files under MEDIA_ROOT/uploads, served by the API. Writes go to
+  a temp file and are renamed into place, so readers never see a partial
+  file.
+- "s3": an S3-compatible bucket (AWS S3, MinIO). Objects are uploaded in
+  multipart chunks and clients get presigned URLs, so the API never serves
+  image bytes and any number of nodes can share the media.
+
+The database stores the stable path `url(key)` (MEDIA_URL + "uploads/" +
+key); responses carry `public_url(key)`.
+"""
+import mimetypes
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Iterable, Optional
+
+from app.config import settings
+
+# Keys never change content once written
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Not in every platform's mime.types (thumbnails are WebP)
+mimetypes.add_type("image/webp", ".webp")
+
+# Smallest part S3 accepts in a multipart upload (except the last one)
+S3_MIN_PART_BYTES = 5 * 1024 * 1024
+
+
+def new_media_id() -> str:
+    return uuid.uuid4().hex
+
+
+def atomic_write(path: str, data: bytes):
+    """Write-then-rename within the same directory (blocking)"""
+    _atomic_write_chunks(path, [data])
+
+
+def _atomic_write_chunks(path: str, chunks: Iterable[bytes]):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class StorageBackend(ABC):
+    """
+    Keys are relative, '/'-separated paths such as `3f/a2/input_3fa2....jpg`.
+    Everything except the URL helpers blocks; call it through run_io.
+    """
+
+    # Directory holding the files when they are local (served by the API), else None
+    root: Optional[str] = None
+
+    def __init__(self, url_prefix: str):
+        self.url_prefix = url_prefix
+
+    @staticmethod
+    def key_for(kind: str, media_id: str, ext: str = ".jpg") -> str:
+        return f"{media_id[:2]}/{media_id[2:4]}/{kind}_{media_id}{ext}"
+
+    @staticmethod
+    def check_key(key: str) -> str:
+        parts = key.split("/")
+        if not key or key.startswith("/") or any(part in ("", ".", "..") for part in parts):
+            raise ValueError(f"Invalid media key: {key}")
+        return key
+
+    def url(self, key: str) -> str:
+        """Stable path stored in the database"""
+        return f"{self.url_prefix}{key}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Inverse of url() for paths stored in the database; None for other URLs"""
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+    def public_url(self, key: str) -> str:
+        """Where clients fetch `key` from"""
+        return self.url(key)
+
+    def resolve_url(self, url: str) -> str:
+        """public_url() of a stored path; other URLs (lazy heatmaps) are returned as is"""
+        key = self.key_from_url(url)
+        return self.public_url(key) if key is not None else url
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def read(self, key: str) -> Optional[bytes]:
+        """Content of `key`, or None if it does not exist"""
+
+    @abstractmethod
+    def save_stream(self, key: str, chunks: Iterable[bytes]) -> str:
+        """Store `chunks` under `key` without holding them all in memory; readers see all or nothing"""
+
+    def save(self, key: str, data: bytes) -> str:
+        return self.save_stream(key, [data])
+
+    def save_once(self, key: str, data: bytes) -> bool:
+        """
+        Store a content-addressed file unless it already exists (same key,
+        same bytes). Returns True if this call wrote it.
+        """
+        if self.exists(key):
+            return False
+        self.save(key, data)
+        return True
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        ...
+
+
+class LocalStorage(StorageBackend):
+    """Files under `root`; the API serves them at `url_prefix`"""
+
+    def __init__(self, root: str, url_prefix: str):
+        super().__init__(url_prefix)
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        """Absolute path of `key`; refuses keys that escape the storage root"""
+        path = os.path.abspath(os.path.join(self.root, *self.check_key(key).split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid media key: {key}")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save_stream(self, key: str, chunks: Iterable[bytes]) -> str:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _atomic_write_chunks(path, chunks)
+        return key
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class S3Storage(StorageBackend):
+    """
+    Objects in an S3-compatible bucket under `prefix`. Objects larger than
+    one part use multipart upload, fed part by part, and become visible only
+    when the upload completes. Clients are sent presigned GET URLs, or
+    `public_base_url` + key for a public bucket or CDN.
+    """
+
+    def __init__(
+        self,
+        url_prefix: str,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        public_endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        public_base_url: Optional[str] = None,
+        presign_seconds: int = 3600,
+        part_bytes: int = 8 * 1024 * 1024,
+    ):
+        import boto3
+        from botocore.config import Config
+
+        super().__init__(url_prefix)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_base_url = public_base_url.rstrip("/") if public_base_url else None
+        self.presign_seconds = presign_seconds
+        self.part_bytes = max(part_bytes, S3_MIN_PART_BYTES)
+
+        # MinIO and most self-hosted stores need path-style addressing
+        config = Config(
+            signature_version="s3v4",
+            s3={"addressing_style": "path" if endpoint_url else "auto"},
+            max_pool_connections=settings.IO_POOL_WORKERS,
+        )
+        session = boto3.session.Session(
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            region_name=region or None,
+        )
+        self.client = session.client("s3", endpoint_url=endpoint_url or None, config=config)
+        # Presigned URLs are signed for a host; sign with the one browsers can reach
+        if public_endpoint_url and public_endpoint_url != endpoint_url:
+            self.presign_client = session.client("s3", endpoint_url=public_endpoint_url, config=config)
+        else:
+            self.presign_client = self.client
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{self.check_key(key)}"
+
+    def public_url(self, key: str) -> str:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self.object_key(key)}"
+        return self.presign_client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.object_key(key)},
+            ExpiresIn=self.presign_seconds,
+        )
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def read(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        with response["Body"] as body:
+            return body.read()
+
+    def save_stream(self, key: str, chunks: Iterable[bytes]) -> str:
+        object_key = self.object_key(key)
+        extra = {
+            "ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream",
+            "CacheControl": IMMUTABLE_CACHE_CONTROL,
+        }
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+
+        def upload_part(body: bytes):
+            number = len(parts) + 1
+            response = self.client.upload_part(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=number, Body=body,
+            )
+            parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= self.part_bytes:
+                    if upload_id is None:
+                        upload_id = self.client.create_multipart_upload(
+                            Bucket=self.bucket, Key=object_key, **extra
+                        )["UploadId"]
+                    upload_part(bytes(buffer[:self.part_bytes]))
+                    del buffer[:self.part_bytes]
+
+            if upload_id is None:
+                # Smaller than one part: a single PUT
+                self.client.put_object(Bucket=self.bucket, Key=object_key, Body=bytes(buffer), **extra)
+                return key
+            if buffer:
+                upload_part(bytes(buffer))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+            return key
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    self.client.abort_multipart_upload(Bucket=self.bucket, Key=object_key, UploadId=upload_id)
+                except Exception as e:
+                    print(f"⚠️  Failed to abort multipart upload of {object_key}: {e}")
+            raise
+
+    def delete(self, key: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        return True
+
+
+def create_storage() -> StorageBackend:
+    url_prefix = f"{settings.MEDIA_URL}uploads/"
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            url_prefix,
+            bucket=settings.S3_BUCKET,
+            prefix=settings.S3_PREFIX,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            public_endpoint_url=settings.S3_PUBLIC_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            public_base_url=settings.S3_PUBLIC_BASE_URL,
+            presign_seconds=settings.S3_PRESIGN_SECONDS,
+            part_bytes=settings.S3_MULTIPART_CHUNK_BYTES,
+        )
+    return LocalStorage(os.path.join(settings.MEDIA_ROOT, "uploads"), url_prefix)
+
+
+# Shared storage for uploads and eager heatmaps
+media_storage = create_storage()
@@ -0,0 +1,209 @@
+"""
+Thumbnails for the history views
+
+Every analysis gets two downscaled WebP derivatives, one of the original and
+one of its heatmap. They are stored next to their source
+(`ab/cd/thumb_<source stem>.webp`) and their paths are recorded on the
+Detection row.
+
+THUMBNAIL_MODE=background renders them right after the analysis is saved;
+"lazy" waits for the first GET /api/thumbnails/{id}/{variant}. Rows from
+before thumbnails existed are filled in on first view or by
+scripts/backfill_thumbnails.py.
+
+Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale by libjpeg itself, so
+making a thumbnail never allocates the full-resolution frame. Thumbnails of
+lazy heatmaps are rendered at thumbnail size from the stored boxes.
+"""
+import asyncio
+import os
+from typing import Dict, Iterable, Optional, Set
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.database import db_service
+from app.services.executor import run_cpu, run_io
+from app.services.heatmap import render_heatmap
+from app.services.metrics import stage_timer
+from app.services.storage import media_storage
+from app.services.uploads import UploadRejected, oriented_size, read_image_header
+from app.utils import stored_detections
+
+VARIANTS = ("original", "heatmap")
+
+# Heatmaps rendered on first view are served from here (HEATMAP_MODE=lazy)
+LAZY_HEATMAP_PREFIX = "/api/heatmaps/"
+
+# JPEG decode-time downscaling, largest reduction first
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def thumbnail_key(source_url: Optional[str]) -> Optional[str]:
+    """Storage key of the thumbnail of a stored image or lazy heatmap URL"""
+    if not source_url:
+        return None
+    key = media_storage.key_from_url(source_url)
+    if key is not None:
+        directory, _, name = key.rpartition("/")
+        name = f"thumb_{os.path.splitext(name)[0]}.webp"
+        return f"{directory}/{name}" if directory else name
+    if source_url.startswith(LAZY_HEATMAP_PREFIX):
+        stem = os.path.splitext(source_url[len(LAZY_HEATMAP_PREFIX):])[0]
+        media_id = stem.partition("_")[2]
+        if media_id:
+            return media_storage.key_for("thumb_heatmap", media_id, ".webp")
+    return None
+
+
+def decode_for_thumbnail(data: bytes, max_side: int):
+    """
+    Decode an image no larger than needed for `max_side`; returns (image,
+    scale of the decoded image relative to the original) or (None, 0)
+    """
+    try:
+        header = read_image_header(data)
+    except UploadRejected:
+        header = None
+    flag = cv2.IMREAD_COLOR
+    if header is not None and header[0] == "jpeg":
+        longest = max(header[1], header[2])
+        for factor, reduced in _REDUCED_FLAGS:
+            if longest // factor >= max_side:
+                flag = reduced
+                break
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        return None, 0.0
+
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if longest > max_side:
+        ratio = max_side / longest
+        image = cv2.resize(
+            image, (max(1, round(width * ratio)), max(1, round(height * ratio))), interpolation=cv2.INTER_AREA
+        )
+    # Boxes are in the EXIF-rotated frame imdecode returns, not the header's
+    size = oriented_size(data)
+    original_width = size[0] if size is not None and size[0] else width
+    return image, image.shape[1] / original_width
+
+
+def encode_thumbnail(image: np.ndarray) -> Optional[bytes]:
+    ok, encoded = cv2.imencode(".webp", image, [cv2.IMWRITE_WEBP_QUALITY, settings.THUMBNAIL_QUALITY])
+    return encoded.tobytes() if ok else None
+
+
+def render_thumbnail(data: Optional[bytes], max_side: int) -> Optional[bytes]:
+    """WebP thumbnail of an encoded image, or None if it is missing or undecodable (blocking)"""
+    if not data:
+        return None
+    image, _ = decode_for_thumbnail(data, max_side)
+    return None if image is None else encode_thumbnail(image)
+
+
+def render_heatmap_thumbnail(original: Optional[bytes], boxes: np.ndarray, max_side: int) -> Optional[bytes]:
+    """Heatmap thumbnail drawn at thumbnail size from the original and its boxes (blocking)"""
+    if not original:
+        return None
+    image, scale = decode_for_thumbnail(original, max_side)
+    if image is None:
+        return None
+    return encode_thumbnail(render_heatmap(image, np.asarray(boxes, dtype=np.float32) * scale))
+
+
+class ThumbnailService:
+    """
+    Renders, stores and records thumbnails. Concurrent requests for the same
+    thumbnail share one render; background renders are bounded by
+    THUMBNAIL_CONCURRENCY so they do not crowd out inference on the CPU pool.
+    """
+
+    def __init__(self):
+        self._renders: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _read(self, url: Optional[str]) -> Optional[bytes]:
+        key = media_storage.key_from_url(url) if url else None
+        return await run_io(media_storage.read, key) if key is not None else None
+
+    async def _render(self, detection, variant: str, key: str) -> Optional[str]:
+        if await run_io(media_storage.exists, key):
+            return key
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.THUMBNAIL_CONCURRENCY)
+        async with self._semaphore:
+            with stage_timer("thumbnail"):
+                source_url = detection.imagePath if variant == "original" else detection.heatmapPath
+                if variant == "original" or media_storage.key_from_url(source_url) is not None:
+                    data = await run_cpu(render_thumbnail, await self._read(source_url), settings.THUMBNAIL_MAX_SIDE)
+                elif detection.boxes is not None:
+                    # Lazy heatmap: never rendered at full size just for its thumbnail
+                    data = await run_cpu(
+                        render_heatmap_thumbnail,
+                        await self._read(detection.imagePath),
+                        stored_detections(detection)["box"],
+                        settings.THUMBNAIL_MAX_SIDE,
+                    )
+                else:
+                    data = None
+                if data is None:
+                    return None
+                await run_io(media_storage.save, key, data)
+        return key
+
+    async def _render_once(self, detection, variant: str) -> Optional[str]:
+        key = thumbnail_key(detection.imagePath if variant == "original" else detection.heatmapPath)
+        if key is None:
+            return None
+        task = self._renders.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(detection, variant, key))
+            self._renders[key] = task
+            task.add_done_callback(lambda _: self._renders.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def ensure(self, detection, variants: Iterable[str] = VARIANTS) -> Dict[str, Optional[str]]:
+        """
+        Render the missing thumbnails of a detection and record them on its
+        row; returns the stored path per variant (None if there is no source)
+        """
+        paths = {"original": detection.thumbnailPath, "heatmap": detection.heatmapThumbnailPath}
+        changed = False
+        for variant in variants:
+            if paths[variant] is None:
+                key = await self._render_once(detection, variant)
+                if key is not None:
+                    paths[variant] = media_storage.url(key)
+                    changed = True
+        if changed:
+            await db_service.set_detection_thumbnails(detection.id, paths["original"], paths["heatmap"])
+        return paths
+
+    async def _ensure_logged(self, detection):
+        try:
+            await self.ensure(detection)
+        except Exception as e:
+            print(f"⚠️  Thumbnails for detection {detection.id} failed: {e}")
+
+    def schedule(self, detection):
+        """Render after an analysis, off the request path (THUMBNAIL_MODE=background)"""
+        if settings.THUMBNAIL_MODE != "background":
+            return
+        task = asyncio.get_running_loop().create_task(self._ensure_logged(detection))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def stop(self, timeout: float = 5.0):
+        """Give in-flight background renders a moment to finish, then cancel the rest"""
+        if not self._background:
+            return
+        _, pending = await asyncio.wait(set(self._background), timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+# Shared instance; the lifespan waits for its background renders on shutdown
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,318 @@
+"""
+Upload guards: size, format and pixel-count checks before decode
+
+Images are checked while they stream in. The sha256 is computed chunk by
+chunk, the byte count is capped at MAX_UPLOAD_BYTES, and the format and
+dimensions are read from the file header (JPEG SOF, PNG IHDR, BMP and WebP
+headers) as soon as enough bytes have arrived. Anything that is not an
+accepted image or declares more than MAX_IMAGE_PIXELS is rejected before
+the decoder allocates the full frame, so a 200 MP photo (or a tiny
+decompression bomb) is never decoded.
+
+UploadLimitMiddleware caps the whole request body of the analyze endpoints
+from Content-Length, or by counting bytes for chunked uploads. Oversized
+requests are refused before Starlette spools them to disk.
+"""
+import hashlib
+import struct
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.config import settings
+from app.services.metrics import UPLOADS_REJECTED
+
+# Room for the multipart boundaries and the other form fields of /analyze
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Start-of-frame markers carrying the dimensions (not DHT/JPG/DAC: C4, C8, CC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class UploadRejected(ValueError):
+    """An upload refused before decode; `status_code` is the HTTP status to answer with"""
+
+    status_code = 400
+    reason = "invalid"
+
+
+class InvalidImageError(UploadRejected):
+    """The upload is not an image in an accepted format, or could not be decoded"""
+
+
+class UploadTooLarge(UploadRejected):
+    status_code = 413
+    reason = "too_large"
+
+
+class ImageTooLarge(UploadRejected):
+    status_code = 413
+    reason = "too_many_pixels"
+
+
+def _jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """Walk the marker segments up to the frame header; None until it has arrived"""
+    i = 2
+    while True:
+        if i + 4 > len(data):
+            return None
+        if data[i] != 0xFF:
+            raise InvalidImageError("Corrupt JPEG header")
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Standalone markers have no length
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            raise InvalidImageError("JPEG has no frame header")
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if length < 2:
+            raise InvalidImageError("Corrupt JPEG header")
+        if marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+
+
+def _png_size(data) -> Optional[Tuple[int, int]]:
+    if len(data) < 24:
+        return None
+    if data[12:16] != b"IHDR":
+        raise InvalidImageError("Corrupt PNG header")
+    return struct.unpack(">II", data[16:24])
+
+
+def _bmp_size(data) -> Optional[Tuple[int, int]]:
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack("<I", data[14:18])[0]
+    if header_size == 12:
+        return struct.unpack("<HH", data[18:22])
+    width, height = struct.unpack("<ii", data[18:26])
+    return abs(width), abs(height)
+
+
+def _webp_size(data) -> Optional[Tuple[int, int]]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    raise InvalidImageError("Corrupt WebP header")
+
+
+def read_image_header(data) -> Optional[Tuple[str, int, int]]:
+    """
+    (format, width, height) from the first bytes of an upload, or None while
+    more bytes are needed. Raises InvalidImageError for anything that is
+    not a JPEG, PNG, BMP or WebP image.
+    """
+    if len(data) < 12:
+        return None
+    if data[:3] == b"\xff\xd8\xff":
+        size, image_format = _jpeg_size(data), "jpeg"
+    elif data[:8] == b"\x89PNG\r\n\x1a\n":
+        size, image_format = _png_size(data), "png"
+    elif data[:2] == b"BM":
+        size, image_format = _bmp_size(data), "bmp"
+    elif data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        size, image_format = _webp_size(data), "webp"
+    else:
+        raise InvalidImageError("Not a JPEG, PNG, BMP or WebP image")
+    return None if size is None else (image_format, *size)
+
+
+def jpeg_orientation(data) -> int:
+    """EXIF orientation (1-8) of a JPEG, 1 when it has none or it is unreadable"""
+    i = 2
+    while i + 4 <= len(data) and data[i] == 0xFF:
+        marker = data[i + 1]
+        if marker in (0xD9, 0xDA) or marker in JPEG_SOF_MARKERS:
+            # EXIF comes before the frame header
+            break
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        segment = data[i + 4:i + 2 + length]
+        if marker == 0xE1 and segment[:6] == b"Exif\0\0":
+            tiff = segment[6:]
+            order = {b"II": "<", b"MM": ">"}.get(bytes(tiff[:2]))
+            if order is None or len(tiff) < 8:
+                return 1
+            ifd = struct.unpack(order + "I", tiff[4:8])[0]
+            if ifd + 2 > len(tiff):
+                return 1
+            count = struct.unpack(order + "H", tiff[ifd:ifd + 2])[0]
+            for entry in range(ifd + 2, min(ifd + 2 + 12 * count, len(tiff) - 11), 12):
+                if struct.unpack(order + "H", tiff[entry:entry + 2])[0] == 0x0112:
+                    value = struct.unpack(order + "H", tiff[entry + 8:entry + 10])[0]
+                    return value if 1 <= value <= 8 else 1
+            return 1
+        i += 2 + length
+    return 1
+
+
+def oriented_size(data) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) of an encoded image as cv2.imdecode returns it, i.e.
+    after applying the JPEG's EXIF orientation; None for anything unreadable
+    """
+    try:
+        header = read_image_header(data)
+    except UploadRejected:
+        return None
+    if header is None:
+        return None
+    image_format, width, height = header
+    if image_format == "jpeg" and jpeg_orientation(data) >= 5:
+        # Orientations 5-8 are transposed
+        return height, width
+    return width, height
+
+
+def _check_pixels(header: Tuple[str, int, int], max_pixels: int):
+    _, width, height = header
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"Image is {width}x{height}; at most {max_pixels} pixels are accepted")
+
+
+def _rejected(error: UploadRejected) -> UploadRejected:
+    UPLOADS_REJECTED.labels(reason=error.reason).inc()
+    return error
+
+
+class UploadGuard:
+    """
+    Collects an upload chunk by chunk, hashing as it goes, and raises an
+    UploadRejected as soon as it is too large, not an accepted image, or
+    declares too many pixels.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_pixels: Optional[int] = None):
+        self.max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+        self.max_pixels = max_pixels or settings.MAX_IMAGE_PIXELS
+        self.data = bytearray()
+        self.header: Optional[Tuple[str, int, int]] = None
+        self._digest = hashlib.sha256()
+
+    def check_size(self, size: int):
+        if size > self.max_bytes:
+            raise _rejected(UploadTooLarge(f"Upload is larger than {self.max_bytes} bytes"))
+
+    def feed(self, chunk: bytes):
+        self.check_size(len(self.data) + len(chunk))
+        self.data += chunk
+        if self.header is None:
+            try:
+                self.header = read_image_header(self.data)
+                if self.header is not None:
+                    _check_pixels(self.header, self.max_pixels)
+            except UploadRejected as e:
+                raise _rejected(e)
+        self._digest.update(chunk)
+
+    def finish(self) -> Tuple[bytes, str]:
+        """(data, sha256 hex) once the whole upload passed"""
+        if self.header is None:
+            raise _rejected(InvalidImageError("Upload is empty or truncated"))
+        return bytes(self.data), self._digest.hexdigest()
+
+
+def check_stream(f, max_bytes: Optional[int] = None) -> Tuple[bytes, str]:
+    """
+    The same checks for a blocking file object (zip members), read in
+    UPLOAD_CHUNK_BYTES chunks; returns (data, sha256 hex) (blocking)
+    """
+    guard = UploadGuard(max_bytes=max_bytes)
+    while True:
+        chunk = f.read(settings.UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        guard.feed(chunk)
+    return guard.finish()
+
+
+def default_body_limits() -> Dict[str, int]:
+    return {
+        "/api/analyze": settings.MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES,
+        "/api/analyze/batch": settings.MAX_BATCH_UPLOAD_BYTES,
+        "/api/analyze/video": settings.MAX_VIDEO_UPLOAD_BYTES,
+    }
+
+
+class UploadLimitMiddleware:
+    """
+    Pure ASGI middleware capping request bodies per path. A declared
+    Content-Length over the limit is refused without reading the body;
+    otherwise the body is counted as it streams and the request is answered
+    with 413 the moment it crosses the limit.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.limits = limits if limits is not None else default_body_limits()
+
+    async def _reject(self, scope, receive, send, limit: int):
+        UPLOADS_REJECTED.labels(reason=UploadTooLarge.reason).inc()
+        response = JSONResponse(
+            {"detail": f"Request body is larger than {limit} bytes"},
+            status_code=413,
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for key, value in scope["headers"]:
+            if key == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await self._reject(scope, receive, send, limit)
+                    return
+                break
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLarge(f"Request body is larger than {limit} bytes")
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app answers to the aborted body (FastAPI turns the
+            # parse failure into a 400) is replaced by the 413 below
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if not exceeded:
+                raise
+        if exceeded:
+            await self._reject(scope, receive, send, limit)
@@ -0,0 +1,344 @@
+"""
+Video analysis: streaming decode -> detect -> track -> aggregate
+
+A producer thread decodes the clip with OpenCV and hands sampled frames to
+the event loop through a small bounded queue, so memory stays flat however
+long the video is. Frames go through the shared inference scheduler (and
+get batched with other traffic); detections are then fed, in frame order,
+to the ByteTrack tracker that ships with ultralytics. Tracks are
+aggregated into per-track class, dwell time and line-crossing counts.
+"""
+import asyncio
+import concurrent.futures
+import math
+import os
+import threading
+import time
+import types
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+from app.config import settings
+from app.services.executor import run_cpu
+
+_END = object()
+
+
+class TrackerDetections:
+    """
+    One frame's detections in the form ultralytics trackers consume
+    (what `Boxes.cpu().numpy()` provides): conf, cls, xyxy, xywh and
+    boolean-mask indexing.
+    """
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    @property
+    def xywh(self) -> np.ndarray:
+        xywh = np.empty_like(self.xyxy)
+        xywh[:, :2] = (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2
+        xywh[:, 2:] = self.xyxy[:, 2:] - self.xyxy[:, :2]
+        return xywh
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __getitem__(self, index) -> "TrackerDetections":
+        return TrackerDetections(self.xyxy[index], self.conf[index], self.cls[index])
+
+
+def make_tracker(sample_fps: float):
+    """ByteTrack with its stock config, lost-track buffer scaled to the sampling rate"""
+    import ultralytics
+    from ultralytics.trackers.byte_tracker import BYTETracker
+
+    path = os.path.join(os.path.dirname(ultralytics.__file__), "cfg", "trackers", "bytetrack.yaml")
+    with open(path) as f:
+        cfg = types.SimpleNamespace(**yaml.safe_load(f))
+    # track_buffer is in frames at 30 FPS; keep lost tracks for the same wall time
+    cfg.track_buffer = max(1, round(cfg.track_buffer * sample_fps / 30))
+    return BYTETracker(args=cfg)
+
+
+def probe_video(path: str) -> bool:
+    """True when OpenCV can open the file and decode a first frame"""
+    capture = cv2.VideoCapture(path)
+    try:
+        return capture.isOpened() and capture.grab()
+    finally:
+        capture.release()
+
+
+@dataclass
+class CountingLine:
+    """Segment in normalized (0-1) frame coordinates"""
+
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+
+    @classmethod
+    def parse(cls, value: str) -> "CountingLine":
+        try:
+            parts = [float(v) for v in value.split(",")]
+        except ValueError:
+            parts = []
+        if len(parts) != 4 or not all(0.0 <= v <= 1.0 for v in parts):
+            raise ValueError("line must be four comma-separated numbers in [0, 1]: x1,y1,x2,y2")
+        if parts[:2] == parts[2:]:
+            raise ValueError("line endpoints must differ")
+        return cls(*parts)
+
+    def crossing(self, p: Tuple[float, float], q: Tuple[float, float], width: int, height: int) -> int:
+        """
+        +1 when the move p -> q (pixels) crosses the segment from its right
+        to its left as seen on screen (for a top-to-bottom line: moving left
+        to right), -1 for the opposite direction, 0 when it does not cross.
+        """
+        a = (self.x1 * width, self.y1 * height)
+        b = (self.x2 * width, self.y2 * height)
+
+        def side(point):
+            return (b[0] - a[0]) * (point[1] - a[1]) - (b[1] - a[1]) * (point[0] - a[0])
+
+        sp, sq = side(p), side(q)
+        if sp == 0 or sq == 0 or (sp > 0) == (sq > 0):
+            return 0
+        # The move must also cross within the segment, not its extension
+        ma = (q[0] - p[0]) * (a[1] - p[1]) - (q[1] - p[1]) * (a[0] - p[0])
+        mb = (q[0] - p[0]) * (b[1] - p[1]) - (q[1] - p[1]) * (b[0] - p[0])
+        if (ma > 0) == (mb > 0):
+            return 0
+        return 1 if sq < 0 else -1
+
+
+@dataclass
+class TrackStats:
+    track_id: int
+    first_seen: float
+    last_seen: float
+    frames: int = 0
+    max_confidence: float = 0.0
+    classes: Counter = field(default_factory=Counter)
+    center: Optional[Tuple[float, float]] = None
+    forward: int = 0
+    backward: int = 0
+
+
+class VideoAnalysis:
+    """
+    One video job. `events()` yields dicts: a "video" header, periodic
+    "progress" updates and a final "summary".
+    """
+
+    def __init__(
+        self,
+        path: str,
+        submit: Callable[[np.ndarray], Awaitable],
+        sample_fps: float,
+        line: Optional[CountingLine] = None,
+        window: Optional[int] = None,
+    ):
+        self.path = path
+        self.submit = submit
+        self.names: Dict[int, str] = {}
+        self.sample_fps = sample_fps
+        self.line = line
+        self.window = window or settings.INFERENCE_MAX_BATCH_SIZE
+        self.tracks: Dict[int, TrackStats] = {}
+        self.frames = 0
+        self._stop = threading.Event()
+
+    # ---- producer thread ---- #
+
+    def _put(self, loop, queue: asyncio.Queue, item) -> bool:
+        """Blocking put from the decode thread; gives up once the job is stopped"""
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                if self._stop.is_set():
+                    future.cancel()
+                    return False
+
+    def _produce(self, loop, queue: asyncio.Queue):
+        capture = cv2.VideoCapture(self.path)
+        try:
+            if not capture.isOpened():
+                raise ValueError("Not a readable video")
+            native_fps = capture.get(cv2.CAP_PROP_FPS)
+            if not native_fps or math.isnan(native_fps) or native_fps <= 0:
+                native_fps = 30.0
+            step = max(1.0, native_fps / self.sample_fps)
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            meta = {
+                "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "fps": round(native_fps, 3),
+                "frame_count": frame_count,
+                "duration_s": round(frame_count / native_fps, 3),
+                "sample_fps": round(native_fps / step, 3),
+                "truncated": frame_count / native_fps > settings.VIDEO_MAX_DURATION_SECONDS,
+            }
+            if not self._put(loop, queue, meta):
+                return
+
+            index, next_sample = 0, 0.0
+            while not self._stop.is_set():
+                # grab() advances without the colour conversion/copy of read()
+                if not capture.grab():
+                    break
+                if index >= next_sample:
+                    timestamp = index / native_fps
+                    if timestamp > settings.VIDEO_MAX_DURATION_SECONDS:
+                        break
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        break
+                    if not self._put(loop, queue, (index, timestamp, frame)):
+                        return
+                    next_sample += step
+                index += 1
+        except Exception as e:
+            self._put(loop, queue, e)
+        finally:
+            capture.release()
+            self._put(loop, queue, _END)
+
+    # ---- aggregation ---- #
+
+    def _update_tracks(self, tracker, detection, frame, timestamp: float):
+        """Tracker step plus aggregation for one frame (runs on the CPU pool)"""
+        self.names = detection.names
+        detections = TrackerDetections(detection.boxes, detection.confidences, detection.class_ids.astype(np.float32))
+        rows = tracker.update(detections, frame)
+        height, width = frame.shape[:2]
+        for x1, y1, x2, y2, track_id, score, cls, *_ in rows:
+            track_id = int(track_id)
+            stats = self.tracks.get(track_id)
+            if stats is None:
+                stats = self.tracks[track_id] = TrackStats(track_id, first_seen=timestamp, last_seen=timestamp)
+            stats.last_seen = timestamp
+            stats.frames += 1
+            stats.max_confidence = max(stats.max_confidence, float(score))
+            stats.classes[int(cls)] += 1
+
+            center = ((x1 + x2) / 2, (y1 + y2) / 2)
+            if self.line is not None and stats.center is not None:
+                direction = self.line.crossing(stats.center, center, width, height)
+                if direction > 0:
+                    stats.forward += 1
+                elif direction < 0:
+                    stats.backward += 1
+            stats.center = center
+        self.frames += 1
+        return sum(1 for s in self.tracks.values() if s.last_seen == timestamp)
+
+    def summary(self, sample_interval: float) -> dict:
+        tracks = []
+        counts: Counter = Counter()
+        forward: Counter = Counter()
+        backward: Counter = Counter()
+        for stats in self.tracks.values():
+            if stats.frames < settings.VIDEO_MIN_TRACK_FRAMES:
+                continue
+            label = self.names.get(stats.classes.most_common(1)[0][0], "unknown")
+            counts[label] += 1
+            forward[label] += stats.forward
+            backward[label] += stats.backward
+            tracks.append({
+                "track_id": stats.track_id,
+                "class": label,
+                "frames": stats.frames,
+                "first_seen_s": round(stats.first_seen, 3),
+                "last_seen_s": round(stats.last_seen, 3),
+                "dwell_s": round(stats.last_seen - stats.first_seen + sample_interval, 3),
+                "max_confidence": round(stats.max_confidence, 4),
+                "crossings": {"forward": stats.forward, "backward": stats.backward},
+            })
+        tracks.sort(key=lambda t: t["first_seen_s"])
+        result = {"frames_sampled": self.frames, "tracks": tracks, "counts": dict(counts)}
+        if self.line is not None:
+            result["line_crossings"] = {
+                "forward": {k: v for k, v in forward.items() if v},
+                "backward": {k: v for k, v in backward.items() if v},
+            }
+        return result
+
+    # ---- pipeline ---- #
+
+    async def events(self) -> AsyncIterator[dict]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.VIDEO_QUEUE_FRAMES)
+        producer = threading.Thread(target=self._produce, args=(loop, queue), name="vf-video-decode", daemon=True)
+        producer.start()
+
+        # Up to `window` frames in inference at once; tracked strictly in order
+        pending = deque()
+        start = time.perf_counter()
+        last_progress = start
+
+        try:
+            meta = await queue.get()
+            if isinstance(meta, Exception):
+                raise meta
+            if meta is _END:
+                raise ValueError("Not a readable video")
+            yield {"type": "video", **meta}
+
+            sample_interval = 1.0 / meta["sample_fps"]
+            tracker = await run_cpu(make_tracker, meta["sample_fps"])
+
+            async def track_oldest():
+                index, timestamp, frame, future = pending.popleft()
+                detection = await future
+                return timestamp, await run_cpu(self._update_tracks, tracker, detection, frame, timestamp)
+
+            finished = False
+            while not finished or pending:
+                if not finished and len(pending) < self.window:
+                    item = await queue.get()
+                    if item is _END:
+                        finished = True
+                        continue
+                    if isinstance(item, Exception):
+                        raise item
+                    index, timestamp, frame = item
+                    pending.append((index, timestamp, frame, asyncio.ensure_future(self.submit(frame))))
+                    continue
+
+                timestamp, active = await track_oldest()
+                now = time.perf_counter()
+                if now - last_progress >= settings.VIDEO_PROGRESS_SECONDS:
+                    last_progress = now
+                    yield {
+                        "type": "progress",
+                        "position_s": round(timestamp, 3),
+                        "frames_sampled": self.frames,
+                        "active_tracks": active,
+                        "tracks": len(self.tracks),
+                    }
+
+            yield {
+                "type": "summary",
+                "processing_s": round(time.perf_counter() - start, 3),
+                **self.summary(sample_interval),
+            }
+        finally:
+            self._stop.set()
+            for *_, future in pending:
+                future.cancel()
+            # Unblock a producer waiting on a full queue
+            while not queue.empty():
+                queue.get_nowait()
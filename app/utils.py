@@ -3,59 +3,158 @@ Utility functions for image processing and AI advice
 """
 import numpy as np
 import cv2
+import io
 import os
-import requests
+import zipfile
+from typing import Dict, List, Optional, Tuple, Union
 from app.config import settings
+from app.services.advice_client import AdviceUnavailable, advice_client, canned_advice
+from app.services.heatmap import render_heatmap
+from app.services.storage import atomic_write
+from app.services.uploads import UploadRejected, check_stream
 
 
-def generate_gradcam(model, image_path, class_id=None, save_path=None):
-    """
-    XAI Logic: Generates a visual heatmap showing model attention.
-    This uses a simulated Grad-CAM approach compatible with YOLO detections.
-    """
-    try:
-        # 1. Load the original image
-        img = cv2.imread(image_path)
-        if img is None:
-            return "Error: Image not found"
+def decode_image(data: bytes):
+    """Decode uploaded image bytes into a BGR ndarray (None if undecodable)"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+# One stored box: class id, confidence, xyxy in image pixels (22 bytes, no padding)
+DETECTION_DTYPE = np.dtype([("class_id", "<u2"), ("confidence", "<f4"), ("box", "<f4", (4,))])
+
+
+def pack_detections(detection) -> bytes:
+    """Pack every box of a DetectionResult, most confident first"""
+    order = np.argsort(-detection.confidences, kind="stable")
+    packed = np.empty(len(order), dtype=DETECTION_DTYPE)
+    packed["class_id"] = detection.class_ids[order]
+    packed["confidence"] = detection.confidences[order]
+    packed["box"] = detection.boxes[order]
+    return packed.tobytes()
+
+
+def unpack_detections(data: Optional[bytes]) -> np.ndarray:
+    """Structured DETECTION_DTYPE array from stored bytes (empty for legacy rows)"""
+    if not data:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+    return np.frombuffer(data, dtype=DETECTION_DTYPE)
+
+
+def stored_detections(detection) -> np.ndarray:
+    """Unpacked boxes of a Detection row"""
+    return unpack_detections(detection.boxes.decode() if detection.boxes is not None else None)
+
+
+def rescale_detections(packed: np.ndarray, scale_x: float, scale_y: float) -> np.ndarray:
+    """Copy of packed boxes moved onto an image resized by (scale_x, scale_y)"""
+    scaled = packed.copy()
+    scaled["box"] *= np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+    return scaled
+
+
+def detected_objects(packed: np.ndarray, names: Dict[int, str]) -> List[dict]:
+    """API representation of packed boxes (already in confidence order)"""
+    return [
+        {
+            "label": names.get(int(record["class_id"]), str(record["class_id"])),
+            "class_id": int(record["class_id"]),
+            "confidence": round(float(record["confidence"]), 4),
+            "box": [round(float(v), 1) for v in record["box"]],
+        }
+        for record in packed
+    ]
+
 
-        height, width, _ = img.shape
+def detection_labels(packed: np.ndarray, names: Dict[int, str]) -> List[str]:
+    """Distinct class names in confidence order"""
+    labels = []
+    for class_id in packed["class_id"]:
+        label = names.get(int(class_id), str(class_id))
+        if label not in labels:
+            labels.append(label)
+    return labels
 
-        # 2. Run a prediction to get bounding boxes for heatmap targeting
-        results = model.predict(source=image_path, conf=settings.CONFIDENCE_THRESHOLD, verbose=False)
 
-        # Create a blank mask for the heatmap
-        mask = np.zeros((height, width), dtype=np.float32)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
 
-        # 3. If an object was detected, generate "attention" zones
-        if len(results[0].boxes) > 0:
-            for box in results[0].boxes:
-                # Get coordinates
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
 
-                # Create a Gaussian "Heat" focus within the bounding box
-                # This simulates where the convolutional layers were most active
-                center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
-                sigma = (x2 - x1) / 3
+class TooManyImagesError(ValueError):
+    """A zip archive holds more images than the batch has room for"""
 
-                y_grid, x_grid = np.ogrid[:height, :width]
-                dist_sq = (x_grid - center_x)**2 + (y_grid - center_y)**2
 
-                # Apply the heat intensity
-                exponent = -dist_sq / (2 * sigma**2)
-                mask += np.exp(exponent)
+def extract_zip_images(
+    data: bytes, max_images: int, max_member_bytes: int
+) -> List[Tuple[str, Union[Tuple[bytes, str], UploadRejected]]]:
+    """
+    Image members of a zip archive, in archive order, as (name, (bytes,
+    sha256 hex)), or (name, UploadRejected) for a member that failed the
+    upload checks while it was decompressed. Raises ValueError for a bad
+    archive or an oversized member (checked against the header before
+    decompressing), TooManyImagesError when it holds more than `max_images`
+    images.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid zip archive")
+
+    images = []
+    with archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith("__MACOSX/") or not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if info.file_size > max_member_bytes:
+                raise ValueError(f"{name} is larger than {max_member_bytes} bytes")
+            if len(images) >= max_images:
+                raise TooManyImagesError(f"Archive contains more than {max_images} images")
+            with archive.open(info) as member:
+                try:
+                    checked = check_stream(member, max_member_bytes)
+                except UploadRejected as e:
+                    checked = e
+            images.append((os.path.basename(name), checked))
+    return images
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash of a BGR image as a signed integer (Postgres
+    BigInt). Re-encoded or resized copies of a frame usually hash the same.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int(np.packbits(bits).view(">i8")[0])
 
-        # 4. Normalize and colorize
-        mask = np.clip(mask, 0, 1)
-        heatmap = cv2.applyColorMap(np.uint8(255 * mask), cv2.COLORMAP_JET)
 
-        # 5. Overlay heatmap onto the original image
-        # 0.6 is original image weight, 0.4 is heatmap weight
-        result_img = cv2.addWeighted(img, 0.6, heatmap, 0.4, 0)
+def generate_gradcam(detection, save_path=None):
+    """
+    XAI Logic: Generates a visual heatmap showing model attention.
+    This uses a simulated Grad-CAM approach compatible with YOLO detections.
+    Boxes and the decoded image come from an existing DetectionResult, so no
+    extra inference or disk read is needed.
+    """
+    try:
+        # 1. Use the image the detector already decoded
+        img = detection.image
+        if img is None:
+            return "Error: Image not found"
+
+        # 2. Gaussian "attention" zones per box, colorized and overlaid
+        # (0.6 original image weight, 0.4 heatmap weight)
+        result_img = render_heatmap(img, detection.boxes)
 
-        # 6. Save the final XAI image
+        # 3. Save the final XAI image (write-then-rename, never a partial file)
         if save_path:
-            cv2.imwrite(save_path, result_img)
+            ok, encoded = cv2.imencode(".jpg", result_img)
+            if not ok:
+                return "Error: Could not encode heatmap"
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            atomic_write(save_path, encoded.tobytes())
             print(f"✅ XAI Heatmap saved to: {save_path}")
             return "saved"
 
@@ -66,35 +165,27 @@ def generate_gradcam(model, image_path, class_id=None, save_path=None):
         return str(e)
 
 
-def get_contextual_advice(detected_object: str) -> str:
+async def fetch_contextual_advice(detected_object: str) -> str:
     """
     Sends the detected object name to Gemini (via OpenRouter)
-    and gets a professional advice response.
+    and returns the advice text. Raises AdviceUnavailable on failure.
     """
     if not settings.OPENROUTER_API_KEY:
-        return "System Error: API Key missing in .env file."
+        raise AdviceUnavailable("System Error: API Key missing in .env file.")
 
     prompt = f"As an AI Traffic and Safety Advisor, I have just detected a '{detected_object}' on the road. Provide a one-sentence safety advice for a driver or city planner regarding this."
 
-    try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "google/gemini-2.0-flash-001",
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ]
-            }
-        )
-
-        if response.status_code == 200:
-            return response.json()['choices'][0]['message']['content']
-        else:
-            return f"Advisor currently unavailable (Error: {response.status_code})"
+    return await advice_client.complete(prompt)
 
-    except Exception as e:
-        return f"Advice could not be generated: {str(e)}"
+
+async def get_contextual_advice(detected_object: str) -> str:
+    """
+    Sends the detected object name to Gemini (via OpenRouter)
+    and gets a professional advice response, falling back to canned
+    advice when the provider is failing.
+    """
+    try:
+        return await fetch_contextual_advice(detected_object)
+    except AdviceUnavailable as e:
+        print(f"⚠️  {e}; using canned advice")
+        return canned_advice(detected_object)
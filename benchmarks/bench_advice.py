@@ -0,0 +1,107 @@
+"""
+Advice provider client: per-call connections vs. the pooled AdviceClient,
+and fallback latency once the circuit breaker opens. Runs fully offline
+against benchmarks.stub_openrouter.
+
+  python -m benchmarks.bench_advice --latency-ms 50 --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.config import settings
+from benchmarks import stub_openrouter
+from benchmarks.common import print_table, summarize, write_json
+
+
+async def per_call_client(base_url: str, prompt: str):
+    """Pre-pool behaviour: a fresh client (and connection) for every call"""
+    async with httpx.AsyncClient(timeout=settings.ADVICE_TIMEOUT_SECONDS) as client:
+        response = await client.post(
+            f"{base_url}/chat/completions",
+            json={"model": "stub", "messages": [{"role": "user", "content": prompt}]},
+        )
+        response.raise_for_status()
+
+
+async def load(call, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(f"label {i}")
+            except Exception:
+                pass
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, time.perf_counter() - start
+
+
+async def run(args):
+    from app.services.advice_client import AdviceClient, AdviceUnavailable
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    settings.OPENROUTER_BASE_URL = base_url
+    settings.OPENROUTER_API_KEY = "stub"
+    stub_openrouter.config.latency_ms = args.latency_ms
+    stub_openrouter.config.jitter_ms = 0
+
+    rows = []
+
+    latencies, elapsed = await load(lambda p: per_call_client(base_url, p), args.requests, args.concurrency)
+    rows.append({"scenario": "per-call client", "rps": round(len(latencies) / elapsed, 1), **summarize(latencies)})
+
+    client = AdviceClient()
+    await client.start()
+    latencies, elapsed = await load(client.complete, args.requests, args.concurrency)
+    rows.append({"scenario": "pooled client", "rps": round(len(latencies) / elapsed, 1), **summarize(latencies)})
+
+    # Provider down: retries until the breaker opens, then immediate fallback
+    stub_openrouter.config.failure_rate = 1.0
+
+    async def with_fallback(prompt):
+        try:
+            await client.complete(prompt)
+        except AdviceUnavailable:
+            pass
+
+    latencies, elapsed = await load(with_fallback, args.requests, args.concurrency)
+    rows.append({"scenario": "provider failing", "rps": round(len(latencies) / elapsed, 1), **summarize(latencies)})
+    stub_openrouter.config.failure_rate = 0.0
+    await client.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the advice provider client")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Stub response latency")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    server = stub_openrouter.serve_in_thread(args.port)
+    try:
+        rows = asyncio.run(run(args))
+    finally:
+        server.should_exit = True
+
+    print_table(rows, ["scenario", "rps", "p50_ms", "p99_ms", "max_ms"])
+    write_json({
+        "benchmark": "advice_client",
+        "stub_latency_ms": args.latency_ms,
+        "concurrency": args.concurrency,
+        "results": rows,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Throughput vs. p99 latency of the micro-batching inference scheduler.
+
+Runs a closed-loop load (N concurrent clients, each submitting back to back)
+against InferenceScheduler for every batch-size / wait-window combination.
+
+Synthetic cost model (no model needed, sleeps release the GIL like OpenVINO):
+  python -m benchmarks.bench_batching --synthetic --overhead-ms 12 --per-image-ms 4
+
+Real model (use a dynamic-batch export, see scripts/export_model.py):
+  python -m benchmarks.bench_batching --model yolo11n_dynamic_openvino_model/ --image media/uploads/input_1767980271.jpg
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.scheduler import InferenceScheduler
+from benchmarks.common import print_table, summarize, write_json
+
+
+def synthetic_infer(overhead_ms: float, per_image_ms: float):
+    def infer(items):
+        time.sleep((overhead_ms + per_image_ms * len(items)) / 1000.0)
+        return list(items)
+    return infer
+
+
+def model_infer(model_path: str):
+    from ultralytics import YOLO
+    from app.services.inference import run_detection_batch
+
+    model = YOLO(model_path, task="detect")
+    return lambda items: run_detection_batch(model, items)
+
+
+async def run_load(scheduler: InferenceScheduler, item, concurrency: int, requests_per_client: int):
+    latencies = []
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            await scheduler.submit(item)
+            latencies.append(time.perf_counter() - start)
+
+    scheduler.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inference micro-batching scheduler")
+    parser.add_argument("--synthetic", action="store_true", help="Use a sleep-based cost model instead of YOLO")
+    parser.add_argument("--overhead-ms", type=float, default=12.0, help="Synthetic fixed cost per batch")
+    parser.add_argument("--per-image-ms", type=float, default=4.0, help="Synthetic marginal cost per image")
+    parser.add_argument("--model", default="yolo11n_dynamic_openvino_model/", help="Dynamic-batch model path")
+    parser.add_argument("--image", default=None, help="Image to submit when benchmarking a real model")
+    parser.add_argument("--batch-sizes", default="1,2,4,8", help="Comma-separated max batch sizes")
+    parser.add_argument("--windows-ms", default="0,2,5,10", help="Comma-separated max wait windows")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        infer = synthetic_infer(args.overhead_ms, args.per_image_ms)
+        item = None
+    else:
+        if not args.image:
+            parser.error("--image is required unless --synthetic is set")
+        infer = model_infer(args.model)
+        item = args.image
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    rows = []
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        for window in [float(w) for w in args.windows_ms.split(",")]:
+            scheduler = InferenceScheduler(infer, batch_size, window, executor=executor)
+            latencies, elapsed = asyncio.run(
+                run_load(scheduler, item, args.concurrency, args.requests)
+            )
+            stats = summarize(latencies)
+            rows.append({
+                "max_batch": batch_size,
+                "window_ms": window,
+                "throughput_rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": stats["p50_ms"],
+                "p99_ms": stats["p99_ms"],
+            })
+    executor.shutdown()
+
+    print_table(rows, ["max_batch", "window_ms", "throughput_rps", "p50_ms", "p99_ms"])
+    write_json({
+        "benchmark": "batching",
+        "mode": "synthetic" if args.synthetic else args.model,
+        "concurrency": args.concurrency,
+        "requests_per_client": args.requests,
+        "results": rows,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Heatmap engine vs. the original full-frame implementation.
+
+  python -m benchmarks.bench_heatmap
+  python -m benchmarks.bench_heatmap --sizes 1920x1080,4000x3000 --boxes 1,20 --json heatmap.json
+
+Reports per-call latency, speedup and the largest per-pixel difference
+from the original output (0-255 scale).
+"""
+import argparse
+
+import cv2
+import numpy as np
+
+from app.services.heatmap import render_heatmap
+from benchmarks.common import print_table, summarize, time_call, write_json
+
+
+def legacy_heatmap(img: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """The pre-engine generate_gradcam body: one full-frame exp per box"""
+    height, width, _ = img.shape
+    mask = np.zeros((height, width), dtype=np.float32)
+    for box in boxes:
+        x1, y1, x2, y2 = box.astype(int)
+        center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
+        sigma = (x2 - x1) / 3
+        y_grid, x_grid = np.ogrid[:height, :width]
+        dist_sq = (x_grid - center_x) ** 2 + (y_grid - center_y) ** 2
+        exponent = -dist_sq / (2 * sigma ** 2)
+        mask += np.exp(exponent)
+    mask = np.clip(mask, 0, 1)
+    heatmap = cv2.applyColorMap(np.uint8(255 * mask), cv2.COLORMAP_JET)
+    return cv2.addWeighted(img, 0.6, heatmap, 0.4, 0)
+
+
+def synthetic_case(width: int, height: int, count: int, seed: int = 0):
+    """Deterministic random frame and vehicle-sized boxes"""
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    bw = rng.uniform(0.04, 0.2, count) * width
+    bh = rng.uniform(0.04, 0.2, count) * height
+    x1 = rng.uniform(0, width - bw)
+    y1 = rng.uniform(0, height - bh)
+    boxes = np.stack([x1, y1, x1 + bw, y1 + bh], axis=1).astype(np.float32)
+    return img, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heatmap generation")
+    parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000", help="Comma-separated WxH")
+    parser.add_argument("--boxes", default="1,5,20", help="Comma-separated box counts")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed iterations per case")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the new engine")
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes.split(","):
+        width, height = (int(v) for v in size.lower().split("x"))
+        for count in (int(b) for b in args.boxes.split(",")):
+            img, boxes = synthetic_case(width, height, count)
+            row = {"size": size, "boxes": count}
+
+            engine = summarize(time_call(lambda: render_heatmap(img, boxes), args.repeat))
+            exact = summarize(time_call(lambda: render_heatmap(img, boxes, max_side=0), args.repeat))
+            row["engine_ms"] = engine["p50_ms"]
+            row["engine_fullres_ms"] = exact["p50_ms"]
+
+            if not args.skip_legacy:
+                legacy = summarize(time_call(lambda: legacy_heatmap(img, boxes), args.repeat, warmup=1))
+                reference = legacy_heatmap(img, boxes).astype(np.int16)
+                row["legacy_ms"] = legacy["p50_ms"]
+                row["speedup"] = round(legacy["p50_ms"] / engine["p50_ms"], 1)
+                row["max_diff"] = int(np.abs(render_heatmap(img, boxes).astype(np.int16) - reference).max())
+                row["max_diff_fullres"] = int(
+                    np.abs(render_heatmap(img, boxes, max_side=0).astype(np.int16) - reference).max()
+                )
+            rows.append(row)
+
+    columns = ["size", "boxes", "engine_ms", "engine_fullres_ms"]
+    if not args.skip_legacy:
+        columns += ["legacy_ms", "speedup", "max_diff", "max_diff_fullres"]
+    print_table(rows, columns)
+    write_json({"benchmark": "heatmap", "repeat": args.repeat, "results": rows}, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Media serving throughput: the old StaticFiles mount, the media route serving
+bytes itself (full downloads and 304 revalidations), and the X-Accel-Redirect
+offload path, where the worker only answers with headers.
+
+  python -m benchmarks.bench_media --images 50 --size-kb 400 --requests 2000 --concurrency 50
+
+Without a front proxy the offload scenario measures the worker side alone
+(no bytes are sent). To measure end to end, run nginx with
+nginx.conf.example pointed at --port (upstream) and MEDIA_ROOT/uploads
+(the internal location) and pass its address:
+
+  python -m benchmarks.bench_media --proxy-url http://127.0.0.1:8080
+
+The client shares the process with the in-process servers, so absolute
+numbers are pessimistic; compare the rows with each other.
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+from app.config import settings
+from app.routes import media_routes
+from app.services.storage import media_storage, new_media_id
+from benchmarks.common import print_table, summarize, write_json
+
+
+def create_images(count: int, size_kb: int):
+    """Random payloads under fresh keys (JPEG-named; the content is not decoded)"""
+    keys = []
+    for _ in range(count):
+        key = media_storage.key_for("bench", new_media_id())
+        media_storage.save(key, os.urandom(size_kb * 1024))
+        keys.append(key)
+    return keys
+
+
+def serve_in_thread(app: FastAPI, port: int):
+    """Start `app` on a daemon thread; returns the uvicorn server once it accepts connections"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def build_app(static_files: bool) -> FastAPI:
+    app = FastAPI()
+    if static_files:
+        app.mount(media_storage.url_prefix.rstrip("/"), StaticFiles(directory=media_storage.root), name="media")
+    else:
+        app.include_router(media_routes.router)
+    return app
+
+
+async def load(base_url: str, keys, total: int, concurrency: int, revalidate: bool):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    received = 0
+    statuses = set()
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        etags = {}
+        if revalidate:
+            for key in keys:
+                etags[key] = (await client.get(media_storage.url(key))).headers.get("etag", "")
+
+        async def one(i: int):
+            nonlocal received
+            key = keys[i % len(keys)]
+            headers = {"If-None-Match": etags[key]} if revalidate else {}
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(media_storage.url(key), headers=headers)
+                latencies.append(time.perf_counter() - start)
+            received += len(response.content)
+            statuses.add(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed, received, statuses
+
+
+def scenario(name: str, base_url: str, keys, args, revalidate: bool = False) -> dict:
+    latencies, elapsed, received, statuses = asyncio.run(load(base_url, keys, args.requests, args.concurrency, revalidate))
+    print(f"[+] {name}: {len(latencies) / elapsed:.0f} req/s, status {sorted(statuses)}")
+    return {
+        "scenario": name,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mb_per_s": round(received / elapsed / 1e6, 1),
+        **summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark media serving: direct vs. front-proxy offload")
+    parser.add_argument("--port", type=int, default=8097, help="Port of the media route (the proxy's upstream); StaticFiles uses the next one")
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=400, help="Size of each image")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--proxy-url", default=None, help="nginx in front of --port, configured like nginx.conf.example")
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    if media_storage.root is None:
+        print("[!] STORAGE_BACKEND is not local; remote media is redirected, not served")
+        return
+
+    keys = create_images(args.images, args.size_kb)
+    local_url = f"http://127.0.0.1:{args.port}"
+    static_url = f"http://127.0.0.1:{args.port + 1}"
+    servers = [
+        serve_in_thread(build_app(static_files=False), args.port),
+        serve_in_thread(build_app(static_files=True), args.port + 1),
+    ]
+    rows = []
+    try:
+        rows.append(scenario("StaticFiles (before)", static_url, keys, args))
+
+        settings.MEDIA_SERVE_MODE = "direct"
+        rows.append(scenario("direct", local_url, keys, args))
+        rows.append(scenario("direct, 304 revalidation", local_url, keys, args, revalidate=True))
+        if args.proxy_url:
+            rows.append(scenario("direct via proxy", args.proxy_url, keys, args))
+
+        settings.MEDIA_SERVE_MODE = "x-accel"
+        rows.append(scenario("x-accel, worker only", local_url, keys, args))
+        if args.proxy_url:
+            rows.append(scenario("x-accel via proxy", args.proxy_url, keys, args))
+    finally:
+        for server in servers:
+            server.should_exit = True
+        for key in keys:
+            media_storage.delete(key)
+
+    print_table(rows, ["scenario", "rps", "mb_per_s", "p50_ms", "p99_ms", "max_ms"])
+    write_json({
+        "benchmark": "media_serving",
+        "image_kb": args.size_kb,
+        "concurrency": args.concurrency,
+        "proxy_url": args.proxy_url,
+        "results": rows,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
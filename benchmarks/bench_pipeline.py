@@ -0,0 +1,340 @@
+"""
+Per-stage microbenchmarks of the /analyze pipeline.
+
+Each stage is timed on its own over a fixed, seeded corpus (synthetic
+scenes, or --images resized to every resolution) at several resolutions
+and box counts:
+
+  decode               cv2.imdecode of the uploaded JPEG
+  predict              model.predict on the decoded frame
+  gradcam              generate_gradcam (heatmap render, no file write)
+  label                DetectionResult.label selection
+  advice               get_contextual_advice against benchmarks.stub_openrouter
+  db_create_detection  DatabaseService.create_detection       (needs --database)
+  db_daily_usage       reserve_daily_usage (one analysis)     (needs --database)
+  email                send_detection_email to a local aiosmtpd sink
+
+Stages that cannot run here (no model, no database, no aiosmtpd) are
+reported as skipped instead of failing the whole run.
+
+  python -m benchmarks.bench_pipeline --json before.json
+  python -m benchmarks.bench_pipeline --json after.json --baseline before.json
+  python -m benchmarks.bench_pipeline --stages decode,gradcam --sizes 1920x1080 --boxes 1,50
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from benchmarks.common import print_table, summarize, time_async, time_call, write_json
+
+STAGES = [
+    "decode", "predict", "gradcam", "label", "advice",
+    "db_create_detection", "db_daily_usage", "email",
+]
+
+
+def scene(width: int, height: int, seed: int) -> np.ndarray:
+    """Deterministic frame with smooth regions, edges and mild sensor noise"""
+    rng = np.random.default_rng(seed)
+    ramp_x = np.linspace(40, 200, width, dtype=np.float32)
+    ramp_y = np.linspace(0, 60, height, dtype=np.float32)[:, None]
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    for c in range(3):
+        img[..., c] = np.clip(ramp_x * (0.6 + 0.2 * c) + ramp_y, 0, 255).astype(np.uint8)
+    for _ in range(24):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(width // 20, width // 4)), int(rng.integers(height // 20, height // 4))
+        color = tuple(int(v) for v in rng.integers(0, 256, 3))
+        cv2.rectangle(img, (x, y), (x + w, y + h), color, -1)
+        cv2.circle(img, (x, y), max(4, w // 4), color[::-1], -1)
+    noise = rng.normal(0, 4, img.shape).astype(np.int16)
+    return np.clip(img.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def boxes_for(width: int, height: int, count: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    bw = rng.uniform(0.04, 0.2, count) * width
+    bh = rng.uniform(0.04, 0.2, count) * height
+    x1 = rng.uniform(0, width - bw)
+    y1 = rng.uniform(0, height - bh)
+    return np.stack([x1, y1, x1 + bw, y1 + bh], axis=1).astype(np.float32)
+
+
+def build_corpus(sizes, box_counts, images_dir, per_size: int, seed: int):
+    """[{size, width, height, frames: [(image, jpeg bytes)]}] plus boxes per count"""
+    sources = []
+    if images_dir:
+        for path in sorted(glob.glob(os.path.join(images_dir, "**", "input_*.jpg"), recursive=True))[:per_size]:
+            img = cv2.imread(path)
+            if img is not None:
+                sources.append(img)
+
+    corpus = []
+    for size in sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        frames = []
+        for i in range(per_size):
+            if sources:
+                img = cv2.resize(sources[i % len(sources)], (width, height), interpolation=cv2.INTER_AREA)
+            else:
+                img = scene(width, height, seed + i)
+            ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            frames.append((img, encoded.tobytes()))
+        corpus.append({
+            "size": size,
+            "width": width,
+            "height": height,
+            "frames": frames,
+            "boxes": {n: boxes_for(width, height, n, seed + n) for n in box_counts},
+        })
+    return corpus
+
+
+def detection_for(image: np.ndarray, boxes: np.ndarray, seed: int):
+    from app.services.detection_types import DetectionResult
+
+    rng = np.random.default_rng(seed)
+    return DetectionResult(
+        image=image,
+        boxes=boxes,
+        confidences=rng.uniform(0.25, 0.99, len(boxes)).astype(np.float32),
+        class_ids=rng.integers(0, 80, len(boxes)).astype(np.int32),
+        names={i: f"class_{i}" for i in range(80)},
+    )
+
+
+def row(stage: str, case: str, samples) -> dict:
+    return {"stage": stage, "case": case, **summarize(samples)}
+
+
+def skipped(stage: str, reason: str) -> dict:
+    print(f"[!] {stage}: skipped ({reason})")
+    return {"stage": stage, "case": "-", "skipped": reason}
+
+
+def bench_cpu_stages(stages, corpus, args) -> list:
+    from app.utils import decode_image, generate_gradcam
+
+    rows = []
+    if "predict" in stages:
+        try:
+            from benchmarks.compare_models import make_detector
+            detect = make_detector(args.backend, args.model, "LATENCY")
+        except Exception as e:
+            rows.append(skipped("predict", f"{type(e).__name__}: {e}"))
+            detect = None
+
+    for entry in corpus:
+        frames = entry["frames"]
+        if "decode" in stages:
+            samples = []
+            for _, data in frames:
+                samples += time_call(lambda: decode_image(data), args.repeat)
+            rows.append(row("decode", entry["size"], samples))
+
+        if "predict" in stages and detect is not None:
+            samples = []
+            for image, _ in frames:
+                samples += time_call(lambda: detect([image]), args.repeat, warmup=1)
+            rows.append(row("predict", entry["size"], samples))
+
+        for count, boxes in entry["boxes"].items():
+            case = f"{entry['size']}/{count} boxes"
+            if "gradcam" in stages:
+                detection = detection_for(frames[0][0], boxes, count)
+                samples = time_call(lambda: generate_gradcam(detection), args.repeat)
+                rows.append(row("gradcam", case, samples))
+            if "label" in stages:
+                detection = detection_for(frames[0][0], boxes, count)
+                samples = time_call(lambda: detection.label, args.repeat * 100)
+                rows.append(row("label", case, samples))
+    return rows
+
+
+async def bench_advice(args) -> list:
+    from app.services.advice_client import advice_client
+    from app.utils import get_contextual_advice
+    from benchmarks import stub_openrouter
+
+    stub_openrouter.config.latency_ms = args.advice_latency_ms
+    stub_openrouter.config.jitter_ms = 0
+    server = stub_openrouter.serve_in_thread(args.advice_port)
+    settings.OPENROUTER_BASE_URL = f"http://127.0.0.1:{args.advice_port}"
+    settings.OPENROUTER_API_KEY = "stub"
+    await advice_client.start()
+    try:
+        samples = await time_async(lambda: get_contextual_advice("car"), args.repeat)
+    finally:
+        await advice_client.close()
+        server.should_exit = True
+    return [row("advice", f"stub {args.advice_latency_ms:g} ms", samples)]
+
+
+async def bench_database(stages, args) -> list:
+    from app.database import db_service
+
+    try:
+        await db_service.connect()
+    except Exception as e:
+        return [skipped(stage, f"database unavailable: {e}") for stage in stages]
+
+    rows = []
+    user = await db_service.create_user(
+        first_name="Bench", last_name="User",
+        email=f"bench-{uuid.uuid4().hex[:12]}@example.invalid", password="!",
+    )
+    try:
+        now = datetime.utcnow()
+        await db_service.prisma.subscription.create(data={
+            "planName": "bench",
+            "dailyLimit": 1_000_000,
+            "startAt": now - timedelta(days=1),
+            "endAt": now + timedelta(days=1),
+            "userId": user.id,
+        })
+        if "db_create_detection" in stages:
+            samples = await time_async(
+                lambda: db_service.create_detection(
+                    object_name="car", advice="Drive safely.",
+                    image_path="/media/uploads/bench.jpg", heatmap_path="/media/uploads/bench_heatmap.jpg",
+                    user_id=user.id,
+                ),
+                args.repeat,
+            )
+            rows.append(row("db_create_detection", "single row", samples))
+        if "db_daily_usage" in stages:
+            samples = await time_async(lambda: db_service.reserve_daily_usage(user.id, 1), args.repeat)
+            rows.append(row("db_daily_usage", "active subscription", samples))
+    finally:
+        # Cascades to the bench detections and subscription
+        await db_service.prisma.user.delete(where={"id": user.id})
+        await db_service.disconnect()
+    return rows
+
+
+async def bench_email(args) -> list:
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        return [skipped("email", "aiosmtpd not installed")]
+
+    from app.services.email import send_detection_email
+
+    class Sink:
+        async def handle_DATA(self, server, session, envelope):
+            return "250 OK"
+
+    controller = Controller(Sink(), hostname="127.0.0.1", port=args.smtp_port)
+    controller.start()
+    settings.EMAIL_ENABLED = True
+    settings.EMAIL_HOST = "127.0.0.1"
+    settings.EMAIL_PORT = args.smtp_port
+    settings.EMAIL_USE_SSL = False
+    settings.EMAIL_USE_TLS = False
+    settings.EMAIL_USERNAME = ""
+    settings.EMAIL_PASSWORD = ""
+    try:
+        samples = await time_async(
+            lambda: send_detection_email(
+                "bench@example.invalid", "Bench", "car", "Drive safely.",
+                "http://localhost/heatmap.jpg", "http://localhost/input.jpg",
+            ),
+            args.repeat,
+        )
+    finally:
+        controller.stop()
+    return [row("email", "local sink, new connection", samples)]
+
+
+async def bench_io_stages(stages, args) -> list:
+    rows = []
+    if "advice" in stages:
+        rows += await bench_advice(args)
+    db_stages = [s for s in ("db_create_detection", "db_daily_usage") if s in stages]
+    if db_stages:
+        if args.database:
+            rows += await bench_database(db_stages, args)
+        else:
+            rows += [skipped(stage, "pass --database to use DATABASE_URL") for stage in db_stages]
+    if "email" in stages:
+        rows += await bench_email(args)
+    return rows
+
+
+def compare_to_baseline(rows: list, path: str) -> None:
+    with open(path) as f:
+        baseline = {(r.get("stage"), r.get("case")): r for r in json.load(f).get("results", [])}
+    table = []
+    for r in rows:
+        before = baseline.get((r["stage"], r["case"]))
+        if not before or "p50_ms" not in before or "p50_ms" not in r:
+            continue
+        change = (r["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        table.append({
+            "stage": r["stage"], "case": r["case"],
+            "before_p50_ms": before["p50_ms"], "after_p50_ms": r["p50_ms"],
+            "change": f"{change:+.1f}%",
+        })
+    if not table:
+        print(f"\n[!] No matching stages in {path}")
+        return
+    print(f"\nvs. {path}:")
+    print_table(table, ["stage", "case", "before_p50_ms", "after_p50_ms", "change"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the analysis pipeline")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000", help="Comma-separated WxH")
+    parser.add_argument("--boxes", default="0,1,5,20", help="Comma-separated box counts")
+    parser.add_argument("--images", default=None, help="Resize input_*.jpg from this folder instead of synthetic scenes")
+    parser.add_argument("--per-size", type=int, default=3, help="Frames per resolution")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per case")
+    parser.add_argument("--model", default=settings.YOLO_MODEL_PATH)
+    parser.add_argument("--backend", choices=["ultralytics", "openvino"], default=settings.INFERENCE_BACKEND)
+    parser.add_argument("--advice-port", type=int, default=8099)
+    parser.add_argument("--advice-latency-ms", type=float, default=0.0, help="Stub provider latency")
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--database", action="store_true", help="Benchmark DB stages against DATABASE_URL")
+    parser.add_argument("--baseline", default=None, help="Earlier --json output to compare against")
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    box_counts = [int(b) for b in args.boxes.split(",")]
+    corpus = build_corpus(args.sizes.split(","), box_counts, args.images, args.per_size, args.seed)
+
+    rows = bench_cpu_stages(stages, corpus, args)
+    rows += asyncio.run(bench_io_stages(stages, args))
+
+    print_table(rows, ["stage", "case", "p50_ms", "p95_ms", "p99_ms", "max_ms", "skipped"])
+    if args.baseline:
+        compare_to_baseline(rows, args.baseline)
+    write_json({
+        "benchmark": "pipeline",
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "corpus": "images" if args.images else "synthetic",
+        "sizes": args.sizes.split(","),
+        "box_counts": box_counts,
+        "model": args.model,
+        "backend": args.backend,
+        "results": rows,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Per-worker memory with and without the shared inference server.
+
+Starts N worker processes that import the detection stack and run one
+detection, then reads RSS/PSS from /proc/<pid>/smaps_rollup (Linux).
+PSS splits shared pages between processes, so it shows what copy-on-write
+and the single-model server actually save.
+
+  python -m benchmarks.bench_worker_rss --workers 4 --json rss.json
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.common import print_table, write_json
+
+SOCKET = "/tmp/visionflow-bench-inference.sock"
+
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower() + "_mb"] = round(int(rest.split()[0]) / 1024, 1)
+    return values
+
+
+def worker(mode: str, ready, done):
+    os.environ["INFERENCE_MODE"] = mode
+    os.environ["INFERENCE_SERVER_SOCKET"] = SOCKET
+    from app.services import inference
+
+    frame = np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+
+    async def detect():
+        inference.scheduler.start()
+        await inference.scheduler.submit(frame)
+        await inference.scheduler.stop()
+
+    asyncio.run(detect())
+    ready.set()
+    done.wait()
+
+
+def measure(mode: str, workers: int) -> list:
+    ctx = mp.get_context("fork")
+    done = ctx.Event()
+    server = None
+    rows = []
+
+    if mode == "server":
+        server = subprocess.Popen([sys.executable, "-m", "app.inference_server", "--socket", SOCKET])
+        while not os.path.exists(SOCKET):
+            time.sleep(0.1)
+
+    procs = []
+    for _ in range(workers):
+        ready = ctx.Event()
+        proc = ctx.Process(target=worker, args=(mode, ready, done))
+        proc.start()
+        procs.append((proc, ready))
+    for proc, ready in procs:
+        ready.wait()
+
+    for i, (proc, _) in enumerate(procs):
+        rows.append({"mode": mode, "process": f"worker {i}", **memory_kb(proc.pid)})
+    if server is not None:
+        # The workers' detections have already compiled the server's model
+        rows.append({"mode": mode, "process": "inference server", **memory_kb(server.pid)})
+
+    done.set()
+    for proc, _ in procs:
+        proc.join()
+    if server is not None:
+        server.terminate()
+        server.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-worker RSS/PSS by inference mode")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", default="local,server", help="Comma-separated modes to measure")
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    rows = []
+    for mode in args.modes.split(","):
+        rows.extend(measure(mode, args.workers))
+
+    totals = {}
+    for row in rows:
+        totals.setdefault(row["mode"], 0.0)
+        totals[row["mode"]] += row.get("pss_mb", 0.0)
+
+    print_table(rows, ["mode", "process", "rss_mb", "pss_mb"])
+    for mode, total in totals.items():
+        print(f"{mode}: total PSS {total:.1f} MB for {args.workers} workers")
+    write_json({
+        "benchmark": "worker_rss",
+        "workers": args.workers,
+        "results": rows,
+        "total_pss_mb": {k: round(v, 1) for k, v in totals.items()},
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
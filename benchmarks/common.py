@@ -0,0 +1,79 @@
+"""
+Shared helpers for benchmark scripts
+"""
+import json
+import os
+import platform
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def summarize(samples_s: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    if not samples_s:
+        return {"count": 0}
+    ms = np.asarray(samples_s, dtype=np.float64) * 1000.0
+    return {
+        "count": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def time_call(func, repeat: int = 10, warmup: int = 2) -> List[float]:
+    """Time `func()` `repeat` times after `warmup` untimed calls"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def time_async(func, repeat: int = 10, warmup: int = 2) -> List[float]:
+    """Async counterpart of time_call: awaits `func()` each iteration"""
+    for _ in range(warmup):
+        await func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": str(os.cpu_count()),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+def write_json(results: dict, path: Optional[str]):
+    """Write results with environment info, or print them when no path is given"""
+    payload = {"environment": environment(), **results}
+    text = json.dumps(payload, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text)
+        print(f"[+] Results written to {path}")
+    else:
+        print(text)
+
+
+def print_table(rows: List[dict], columns: List[str]):
+    """Plain fixed-width table for terminal output"""
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
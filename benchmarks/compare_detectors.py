@@ -0,0 +1,110 @@
+"""
+Ultralytics wrapper vs. native OpenVINO backend on the same images.
+
+Checks that both produce the same detections (class ids, boxes within a
+pixel tolerance, confidences within a small epsilon) and reports per-image
+latency for each backend, plus the native backend's batched throughput.
+
+  python -m benchmarks.compare_detectors --images media/uploads --pattern "input_*.jpg"
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from benchmarks.common import print_table, summarize, time_call, write_json
+
+
+def load_images(directory: str, pattern: str, limit: int):
+    # Recursive, so both flat and sharded (ab/cd/input_*.jpg) upload layouts work
+    paths = sorted(glob.glob(os.path.join(directory, "**", pattern), recursive=True))[:limit]
+    images = [(p, cv2.imread(p)) for p in paths]
+    return [(p, img) for p, img in images if img is not None]
+
+
+def compare(reference, candidate, box_tol: float, conf_tol: float) -> dict:
+    """Match two DetectionResults box by box (both are sorted by confidence)"""
+    same_count = len(reference) == len(candidate)
+    n = min(len(reference), len(candidate))
+    box_diff = float(np.abs(reference.boxes[:n] - candidate.boxes[:n]).max()) if n else 0.0
+    conf_diff = float(np.abs(reference.confidences[:n] - candidate.confidences[:n]).max()) if n else 0.0
+    same_classes = bool(np.array_equal(reference.class_ids[:n], candidate.class_ids[:n]))
+    return {
+        "boxes": f"{len(reference)}/{len(candidate)}",
+        "max_box_diff_px": round(box_diff, 3),
+        "max_conf_diff": round(conf_diff, 5),
+        "match": same_count and same_classes and box_diff <= box_tol and conf_diff <= conf_tol,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the ultralytics and native OpenVINO detectors")
+    parser.add_argument("--model", default=settings.YOLO_MODEL_PATH)
+    parser.add_argument("--images", default=os.path.join(settings.MEDIA_ROOT, "uploads"))
+    parser.add_argument("--pattern", default="input_*.jpg")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--hint", default="LATENCY", help="OpenVINO performance hint for the native backend")
+    parser.add_argument("--box-tol", type=float, default=1.0, help="Allowed box difference in pixels")
+    parser.add_argument("--conf-tol", type=float, default=1e-3)
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    from app.services.inference import run_detection
+    from app.services.openvino_backend import OpenVINODetector
+
+    images = load_images(args.images, args.pattern, args.limit)
+    if not images:
+        raise SystemExit(f"No images matching {args.pattern} in {args.images}")
+
+    start = time.perf_counter()
+    wrapper = YOLO(args.model, task="detect")
+    wrapper.predict(images[0][1], verbose=False)
+    wrapper_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    native = OpenVINODetector(args.model, settings.CONFIDENCE_THRESHOLD, performance_hint=args.hint)
+    native.predict_batch([images[0][1]])
+    native_load = time.perf_counter() - start
+
+    rows, wrapper_times, native_times = [], [], []
+    for path, image in images:
+        reference = run_detection(wrapper, image)
+        candidate = native.predict_batch([image])[0]
+        rows.append({"image": os.path.basename(path), **compare(reference, candidate, args.box_tol, args.conf_tol)})
+        wrapper_times += time_call(lambda: run_detection(wrapper, image), repeat=args.repeat, warmup=1)
+        native_times += time_call(lambda: native.predict_batch([image]), repeat=args.repeat, warmup=1)
+
+    # All images at once through the async infer queue
+    batch = [image for _, image in images]
+    batch_times = time_call(lambda: native.predict_batch(batch), repeat=max(1, args.repeat // 2), warmup=1)
+    batch_ips = len(batch) / float(np.median(batch_times))
+
+    print_table(rows, ["image", "boxes", "max_box_diff_px", "max_conf_diff", "match"])
+    latency_rows = [
+        {"backend": "ultralytics", "load_s": round(wrapper_load, 2), **summarize(wrapper_times)},
+        {"backend": "openvino", "load_s": round(native_load, 2), **summarize(native_times)},
+    ]
+    print()
+    print_table(latency_rows, ["backend", "load_s", "mean_ms", "p50_ms", "p99_ms"])
+    print(f"openvino batched ({args.hint}): {batch_ips:.1f} images/s over {len(batch)} images")
+
+    mismatches = sum(not row["match"] for row in rows)
+    print(f"{len(rows) - mismatches}/{len(rows)} images match")
+    write_json({
+        "benchmark": "compare_detectors",
+        "model": args.model,
+        "performance_hint": args.hint,
+        "images": rows,
+        "latency": latency_rows,
+        "batched_images_per_s": round(batch_ips, 1),
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
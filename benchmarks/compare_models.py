@@ -0,0 +1,149 @@
+"""
+Model variant comparison: FP32 baseline vs. a candidate (e.g. INT8) export.
+
+Latency uses one image per call with the LATENCY hint, throughput pushes the
+whole image set through one batch with the THROUGHPUT hint. Agreement treats
+the baseline's detections as reference: a candidate box matches when it has
+the same class and IoU >= --iou with a not yet matched baseline box.
+
+  python -m benchmarks.compare_models --baseline yolo11n_openvino_model/ \\
+      --candidate yolo11n_int8_openvino_model/ --images media/uploads
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.config import settings
+from benchmarks.common import print_table, summarize, time_call, write_json
+from benchmarks.compare_detectors import load_images
+
+
+def model_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return round(total / 1e6, 2)
+
+
+def make_detector(backend: str, model_path: str, hint: str):
+    """Callable images -> List[DetectionResult] for the chosen backend"""
+    if backend == "openvino":
+        from app.services.openvino_backend import OpenVINODetector
+
+        return OpenVINODetector(model_path, settings.CONFIDENCE_THRESHOLD, performance_hint=hint).predict_batch
+
+    from ultralytics import YOLO
+    from app.services.inference import run_detection
+
+    model = YOLO(model_path, task="detect")
+    return lambda images: [run_detection(model, image) for image in images]
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of xyxy boxes, shape (len(a), len(b))"""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match(reference, candidate, iou_threshold: float):
+    """Greedy class-aware matching in candidate confidence order; returns (iou, conf delta) per match"""
+    if not len(reference) or not len(candidate):
+        return []
+    ious = box_iou(candidate.boxes, reference.boxes)
+    ious[candidate.class_ids[:, None] != reference.class_ids[None, :]] = 0.0
+    taken = np.zeros(len(reference), dtype=bool)
+    matches = []
+    for i in np.argsort(-candidate.confidences, kind="stable"):
+        row = np.where(taken, 0.0, ious[i])
+        j = int(row.argmax())
+        if row[j] >= iou_threshold:
+            taken[j] = True
+            matches.append((float(row[j]), abs(float(candidate.confidences[i] - reference.confidences[j]))))
+    return matches
+
+
+def agreement(references, candidates, iou_threshold: float) -> dict:
+    ref_boxes = sum(len(r) for r in references)
+    cand_boxes = sum(len(c) for c in candidates)
+    matches = [m for r, c in zip(references, candidates) for m in match(r, c, iou_threshold)]
+    same_label = sum(r.label == c.label for r, c in zip(references, candidates))
+    return {
+        "baseline_boxes": ref_boxes,
+        "candidate_boxes": cand_boxes,
+        "recall": round(len(matches) / ref_boxes, 4) if ref_boxes else 1.0,
+        "precision": round(len(matches) / cand_boxes, 4) if cand_boxes else 1.0,
+        "mean_iou": round(float(np.mean([m[0] for m in matches])), 4) if matches else None,
+        "mean_conf_delta": round(float(np.mean([m[1] for m in matches])), 4) if matches else None,
+        "same_label_images": f"{same_label}/{len(references)}",
+    }
+
+
+def profile(name: str, backend: str, model_path: str, images, repeat: int) -> tuple:
+    start = time.perf_counter()
+    latency_detector = make_detector(backend, model_path, "LATENCY")
+    latency_detector(images[:1])
+    load_s = time.perf_counter() - start
+
+    results = latency_detector(images)
+    latencies = []
+    for image in images:
+        latencies += time_call(lambda: latency_detector([image]), repeat=repeat, warmup=0)
+
+    throughput_detector = make_detector(backend, model_path, "THROUGHPUT")
+    batch_times = time_call(lambda: throughput_detector(images), repeat=max(1, repeat // 2), warmup=1)
+
+    row = {
+        "model": name,
+        "path": model_path,
+        "size_mb": model_size_mb(model_path),
+        "load_s": round(load_s, 2),
+        "images_per_s": round(len(images) / float(np.median(batch_times)), 1),
+        **summarize(latencies),
+    }
+    return row, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two model variants on latency, throughput and agreement")
+    parser.add_argument("--baseline", default=settings.YOLO_MODEL_VARIANTS["fp32"])
+    parser.add_argument("--candidate", default=settings.YOLO_MODEL_VARIANTS["int8"])
+    parser.add_argument("--backend", choices=["openvino", "ultralytics"], default="openvino")
+    parser.add_argument("--images", default=os.path.join(settings.MEDIA_ROOT, "uploads"))
+    parser.add_argument("--pattern", default="input_*.jpg")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed for two boxes to agree")
+    parser.add_argument("--json", default=None, help="Write machine-readable results here")
+    args = parser.parse_args()
+
+    images = [image for _, image in load_images(args.images, args.pattern, args.limit)]
+    if not images:
+        raise SystemExit(f"No images matching {args.pattern} in {args.images}")
+
+    baseline_row, references = profile("baseline", args.backend, args.baseline, images, args.repeat)
+    candidate_row, candidates = profile("candidate", args.backend, args.candidate, images, args.repeat)
+    agree = agreement(references, candidates, args.iou)
+
+    print_table([baseline_row, candidate_row], ["model", "size_mb", "load_s", "p50_ms", "p99_ms", "images_per_s"])
+    speedup = candidate_row["images_per_s"] / baseline_row["images_per_s"] if baseline_row["images_per_s"] else 0.0
+    print(f"\nthroughput speedup: {speedup:.2f}x over {len(images)} images")
+    print(f"agreement at IoU>={args.iou}: " + ", ".join(f"{k}={v}" for k, v in agree.items()))
+    write_json({
+        "benchmark": "compare_models",
+        "backend": args.backend,
+        "iou_threshold": args.iou,
+        "images": len(images),
+        "results": [baseline_row, candidate_row],
+        "throughput_speedup": round(speedup, 3),
+        "agreement": agree,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+  python -m benchmarks.stub_openrouter --port 8099 --latency-ms 300 --failure-rate 0.1
+
+Point the API at it for offline testing:
+
+  OPENROUTER_BASE_URL=http://127.0.0.1:8099 OPENROUTER_API_KEY=stub
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class StubConfig:
+    """Behaviour knobs, mutable at runtime by in-process benchmarks"""
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    failure_rate: float = 0.0     # fraction of requests answered with 503
+    hang_rate: float = 0.0        # fraction of requests that never answer
+    requests: int = 0
+
+
+config = StubConfig()
+app = FastAPI(title="OpenRouter stub")
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    config.requests += 1
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+
+    roll = random.random()
+    if roll < config.hang_rate:
+        await asyncio.sleep(3600)
+    await asyncio.sleep(max(0.0, config.latency_ms + random.uniform(-1, 1) * config.jitter_ms) / 1000.0)
+    if roll < config.hang_rate + config.failure_rate:
+        return JSONResponse({"error": "stub failure"}, status_code=503)
+
+    return {
+        "id": f"stub-{config.requests}",
+        "model": body.get("model", "stub"),
+        "choices": [
+            {"message": {"role": "assistant", "content": f"Stub advice for: {prompt[:60]}"}}
+        ],
+    }
+
+
+def serve_in_thread(port: int):
+    """Start the stub on a daemon thread; returns the uvicorn server"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local OpenRouter stub")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--failure-rate", type=float, default=config.failure_rate)
+    parser.add_argument("--hang-rate", type=float, default=config.hang_rate)
+    args = parser.parse_args()
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.failure_rate = args.failure_rate
+    config.hang_rate = args.hang_rate
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
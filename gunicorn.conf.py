@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration for multi-worker deployments
+
+  gunicorn app.main:app -c gunicorn.conf.py
+
+With preload_app the master imports the application (ultralytics, torch,
+OpenCV, NumPy and the app itself) once and forks workers, which share those
+pages copy-on-write. OpenVINO compiles the model lazily on the first
+prediction, i.e. after the fork, because the runtime's thread pools are not
+fork-safe; for a single compiled model across all workers run
+`python -m app.inference_server` and set INFERENCE_MODE=server.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the Prometheus multiprocess files
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
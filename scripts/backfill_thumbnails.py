@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Backfill Script
+Renders the history thumbnails of detections saved before thumbnails existed
+(or while THUMBNAIL_MODE=lazy), so the history page never waits on a render:
+
+  python scripts/backfill_thumbnails.py --batch-size 200 --concurrency 4
+
+Rows that already have both thumbnails are skipped, so the backfill can be
+interrupted and re-run. It works against whichever STORAGE_BACKEND is set.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import db_service  # noqa: E402
+from app.services.executor import shutdown_executors  # noqa: E402
+from app.services.thumbnails import thumbnail_service  # noqa: E402
+
+
+async def backfill(batch_size: int, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    failed = 0
+
+    async def one(detection):
+        nonlocal failed
+        async with semaphore:
+            try:
+                await thumbnail_service.ensure(detection)
+            except Exception as e:
+                failed += 1
+                print(f"[!] Detection {detection.id}: {e}")
+
+    await db_service.connect()
+    done = 0
+    try:
+        cursor = 0
+        while True:
+            rows = await db_service.get_detections_without_thumbnails(cursor, batch_size)
+            if not rows:
+                break
+            cursor = rows[-1].id
+            await asyncio.gather(*(one(row) for row in rows))
+            done += len(rows)
+            print(f"[+] Rows up to id {cursor}: {len(rows)} processed")
+    finally:
+        await db_service.disconnect()
+    if failed:
+        print(f"[!] {failed} detections failed; re-run to retry them")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render missing history thumbnails")
+    parser.add_argument("--batch-size", type=int, default=200, help="Detection rows fetched per query")
+    parser.add_argument("--concurrency", type=int, default=4, help="Detections processed in parallel")
+    args = parser.parse_args()
+
+    try:
+        done = asyncio.run(backfill(args.batch_size, args.concurrency))
+    finally:
+        shutdown_executors()
+    print(f"[+] {done} detections backfilled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Media Copy Script
+Copies local uploads into the configured storage backend (STORAGE_BACKEND=s3),
+streaming each file in multipart chunks. Keys and the paths stored in the
+database stay the same, so no rows need rewriting:
+
+  STORAGE_BACKEND=s3 S3_ENDPOINT_URL=http://localhost:9000 \
+      python scripts/copy_media_to_backend.py --root media/uploads
+
+Files that already exist in the backend are skipped, so the copy can be
+re-run. Run scripts/migrate_media_layout.py first to get the sharded layout.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.services.storage import media_storage  # noqa: E402
+
+
+def read_chunks(path: str, chunk_bytes: int):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            yield chunk
+
+
+def local_keys(root: str):
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(directory, name)
+            yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def copy_one(key: str, path: str) -> bool:
+    if media_storage.exists(key):
+        return False
+    media_storage.save_stream(key, read_chunks(path, settings.S3_MULTIPART_CHUNK_BYTES))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy local media uploads into the configured storage backend")
+    parser.add_argument("--root", default=os.path.join(settings.MEDIA_ROOT, "uploads"), help="Local uploads directory")
+    parser.add_argument("--workers", type=int, default=8, help="Files copied in parallel")
+    args = parser.parse_args()
+
+    if media_storage.root is not None:
+        print("[!] STORAGE_BACKEND is local; set STORAGE_BACKEND=s3 and the S3_* settings first")
+        sys.exit(1)
+    if not os.path.isdir(args.root):
+        print(f"[!] Uploads directory not found: {args.root}")
+        sys.exit(1)
+
+    files = list(local_keys(args.root))
+    print(f"[+] {len(files)} local files")
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        copied = sum(pool.map(lambda item: copy_one(*item), files))
+    print(f"[+] {copied} copied, {len(files) - copied} already present")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+OpenVINO Model Export Script
+Re-exports the YOLO11n weights to OpenVINO IR.
+
+The bundled `yolo11n_openvino_model/` is a static batch-1 export, which caps
+the inference scheduler at one image per call. Export a dynamic-batch model
+so concurrent /analyze requests can share a forward pass:
+
+  python scripts/export_model.py --weights yolo11n.pt --dynamic --batch 8
+
+Then point the API at it:
+
+  YOLO_MODEL_PATH=yolo11n_dynamic_openvino_model/ INFERENCE_MAX_BATCH_SIZE=8
+
+Exporting YOLO11 weights needs ultralytics>=8.3 and torch installed.
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from ultralytics import YOLO
+
+
+def export(weights: str, output: str, dynamic: bool, batch: int, imgsz: int, half: bool) -> str:
+    model = YOLO(weights)
+    exported = model.export(
+        format="openvino",
+        dynamic=dynamic,
+        batch=batch,
+        imgsz=imgsz,
+        half=half,
+    )
+
+    if output and os.path.abspath(exported) != os.path.abspath(output):
+        if os.path.exists(output):
+            shutil.rmtree(output)
+        shutil.move(exported, output)
+        exported = output
+
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLO weights to OpenVINO IR")
+    parser.add_argument("--weights", default="yolo11n.pt", help="PyTorch weights to export")
+    parser.add_argument("--output", default="yolo11n_dynamic_openvino_model", help="Output model directory")
+    parser.add_argument("--dynamic", action="store_true", help="Export with a dynamic batch dimension")
+    parser.add_argument("--batch", type=int, default=8, help="Batch size recorded in the export metadata")
+    parser.add_argument("--imgsz", type=int, default=640, help="Input image size")
+    parser.add_argument("--half", action="store_true", help="Compress weights to FP16")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.weights) and not args.weights.endswith(".pt"):
+        print(f"[!] Weights not found: {args.weights}")
+        sys.exit(1)
+
+    path = export(args.weights, args.output, args.dynamic, args.batch, args.imgsz, args.half)
+    print(f"[+] OpenVINO model written to {path}")
+
+
+if __name__ == "__main__":
+    main()
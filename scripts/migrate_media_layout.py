@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Media Layout Migration Script
+Moves the flat `media/uploads/{input,heatmap}_*.jpg` files into the sharded
+layout (`ab/cd/<kind>_<id>.jpg`, see app.services.storage) and rewrites
+Detection.imagePath / heatmapPath to match:
+
+  python scripts/migrate_media_layout.py --dry-run
+  python scripts/migrate_media_layout.py --batch-size 500
+
+Originals are re-keyed by the sha256 of their content (which also fills
+Detection.contentHash where it is empty), heatmaps by a uuid5 of their old
+name, so re-running after an interruption picks up where it stopped.
+
+The migration is copy -> rewrite -> delete: new files are written first,
+database rows are updated in batches (one transaction per batch), and the
+flat files are removed only after every row points at the new layout. The
+API can keep serving throughout.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import uuid
+from typing import Dict
+
+from prisma import Prisma
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.services.storage import LocalStorage, media_storage  # noqa: E402
+
+FLAT_NAME_RE = re.compile(r"^(input|heatmap)_[A-Za-z0-9_\-]+\.(jpg|jpeg|png)$", re.IGNORECASE)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def plan_moves(storage: LocalStorage) -> Dict[str, str]:
+    """Flat file name -> sharded key"""
+    moves = {}
+    for name in sorted(os.listdir(storage.root)):
+        match = FLAT_NAME_RE.match(name)
+        if not match or not os.path.isfile(os.path.join(storage.root, name)):
+            continue
+        kind = match.group(1).lower()
+        ext = os.path.splitext(name)[1].lower()
+        if kind == "input":
+            media_id = file_sha256(os.path.join(storage.root, name))
+        else:
+            media_id = uuid.uuid5(uuid.NAMESPACE_URL, name).hex
+        moves[name] = storage.key_for(kind, media_id, ext)
+    return moves
+
+
+def copy_files(storage: LocalStorage, moves: Dict[str, str]) -> int:
+    """Write every file at its new key (atomically); identical originals share one"""
+    written = 0
+    for name, key in moves.items():
+        with open(os.path.join(storage.root, name), "rb") as f:
+            if storage.save_once(key, f.read()):
+                written += 1
+    return written
+
+
+async def rewrite_paths(storage: LocalStorage, moves: Dict[str, str], batch_size: int, dry_run: bool) -> int:
+    """Point Detection rows at the new keys, `batch_size` rows per transaction"""
+    urls = {storage.url(name): storage.url(key) for name, key in moves.items()}
+    db = Prisma()
+    await db.connect()
+    updated = 0
+    try:
+        cursor = None
+        while True:
+            page = {"cursor": {"id": cursor}, "skip": 1} if cursor is not None else {}
+            rows = await db.detection.find_many(take=batch_size, order={"id": "asc"}, **page)
+            if not rows:
+                break
+            cursor = rows[-1].id
+
+            changes = []
+            for row in rows:
+                data = {}
+                if row.imagePath in urls:
+                    data["imagePath"] = urls[row.imagePath]
+                    if row.contentHash is None and "/input_" in data["imagePath"]:
+                        data["contentHash"] = os.path.splitext(data["imagePath"].rsplit("_", 1)[1])[0]
+                if row.heatmapPath in urls:
+                    data["heatmapPath"] = urls[row.heatmapPath]
+                if data:
+                    changes.append((row.id, data))
+
+            if changes and not dry_run:
+                async with db.batch_() as batcher:
+                    for detection_id, data in changes:
+                        batcher.detection.update(where={"id": detection_id}, data=data)
+            updated += len(changes)
+            print(f"[+] Rows up to id {cursor}: {len(changes)} rewritten")
+    finally:
+        await db.disconnect()
+    return updated
+
+
+def remove_flat_files(storage: LocalStorage, moves: Dict[str, str]) -> int:
+    removed = 0
+    for name in moves:
+        try:
+            os.remove(os.path.join(storage.root, name))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move flat media uploads into the sharded layout")
+    parser.add_argument("--root", default=os.path.join(settings.MEDIA_ROOT, "uploads"), help="Uploads directory (default: MEDIA_ROOT/uploads)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Detection rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--keep-old", action="store_true", help="Leave the flat files in place after migrating")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"[!] Uploads directory not found: {args.root}")
+        sys.exit(1)
+
+    storage = LocalStorage(args.root, media_storage.url_prefix)
+    moves = plan_moves(storage)
+    if not moves:
+        print("[+] Nothing to migrate: no flat input_/heatmap_ files")
+        return
+    print(f"[+] {len(moves)} flat files to migrate")
+
+    if not args.dry_run:
+        print(f"[+] {copy_files(storage, moves)} files written to the sharded layout")
+    updated = asyncio.run(rewrite_paths(storage, moves, args.batch_size, args.dry_run))
+    print(f"[+] {updated} detection rows {'would be ' if args.dry_run else ''}rewritten")
+
+    if args.dry_run or args.keep_old:
+        return
+    print(f"[+] {remove_flat_files(storage, moves)} flat files removed")
+
+
+if __name__ == "__main__":
+    main()
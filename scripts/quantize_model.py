@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+INT8 Quantization Script
+Post-training quantization of the OpenVINO IR with NNCF, calibrated on a
+local image folder (by default the stored upload originals, input_*):
+
+  python scripts/quantize_model.py --model yolo11n_openvino_model/ --images media/uploads
+
+Writes `yolo11n_int8_openvino_model/` next to the FP32 model. Select it with
+YOLO_MODEL_VARIANT=int8 (or YOLO_MODEL_PATH), and check accuracy/latency
+against the FP32 model with benchmarks/compare_models.py.
+
+Calibration images go through the same letterbox/normalization as serving
+(app.services.model_metadata.preprocess). The detect head's box decoding
+(DFL, anchor arithmetic, sigmoid) stays in floating point, as in the
+ultralytics INT8 export, because quantizing it costs box accuracy for
+almost no speed.
+
+Needs `pip install nncf` in addition to the API requirements.
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import shutil
+import sys
+
+import cv2
+import nncf
+import openvino as ov
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.model_metadata import preprocess, read_model_metadata  # noqa: E402
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp", "*.webp")
+
+
+def head_ignored_scope(model) -> "nncf.IgnoredScope":
+    """Box decoding ops of the detect head (the last `model.N` module), kept in floating point"""
+    indices = [
+        int(match.group(1))
+        for op in model.get_ops()
+        if (match := re.search(r"model\.(\d+)/", op.get_friendly_name()))
+    ]
+    patterns = [r".*\.dfl.*"]
+    if indices:
+        head = rf"model\.{max(indices)}"
+        patterns += [rf".*{head}/.*/Add", rf".*{head}/.*/Sub.*", rf".*{head}/.*/Mul.*", rf".*{head}/.*/Div.*"]
+    return nncf.IgnoredScope(patterns=patterns, types=["Sigmoid"], validate=False)
+
+
+def calibration_images(directory: str, subset: int, seed: int, prefix: str):
+    paths = []
+    for pattern in IMAGE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(directory, "**", pattern), recursive=True))
+    # Only originals: heatmaps are false-colour overlays and thumbnails are
+    # downscaled copies, neither looks like what the model is fed
+    paths = sorted(p for p in paths if os.path.basename(p).startswith(prefix))
+    random.Random(seed).shuffle(paths)
+    return paths[:subset]
+
+
+def quantize(model_path: str, output: str, images, preset: str, fast_bias_correction: bool) -> str:
+    xml_files = sorted(glob.glob(os.path.join(model_path, "*.xml")))
+    if not xml_files:
+        raise FileNotFoundError(f"No OpenVINO IR (*.xml) found in {model_path}")
+
+    metadata = read_model_metadata(model_path)
+    input_hw = tuple(int(v) for v in metadata.get("imgsz", [640, 640]))
+
+    def transform(path):
+        return preprocess(cv2.imread(path), input_hw)
+
+    model = ov.Core().read_model(xml_files[0])
+    quantized = nncf.quantize(
+        model,
+        nncf.Dataset(images, transform),
+        preset=nncf.QuantizationPreset[preset.upper()],
+        subset_size=len(images),
+        fast_bias_correction=fast_bias_correction,
+        ignored_scope=head_ignored_scope(model),
+    )
+
+    if os.path.exists(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+    ov.save_model(quantized, os.path.join(output, os.path.basename(xml_files[0])), compress_to_fp16=False)
+
+    metadata.setdefault("args", {})["int8"] = True
+    metadata["description"] = f"{metadata.get('description', 'YOLO')} (INT8, NNCF {nncf.__version__})"
+    with open(os.path.join(output, "metadata.yaml"), "w") as f:
+        yaml.safe_dump(metadata, f, sort_keys=False)
+
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the OpenVINO YOLO model to INT8 with NNCF")
+    parser.add_argument("--model", default="yolo11n_openvino_model", help="FP32/FP16 OpenVINO model directory")
+    parser.add_argument("--output", default="yolo11n_int8_openvino_model", help="Output model directory")
+    parser.add_argument("--images", default="media/uploads", help="Calibration image folder (searched recursively)")
+    parser.add_argument("--prefix", default="input_",
+                        help="Only use files whose name starts with this (stored originals); '' for any image")
+    parser.add_argument("--subset", type=int, default=300, help="Maximum number of calibration images")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking the calibration subset")
+    parser.add_argument("--preset", choices=["mixed", "performance"], default="mixed",
+                        help="mixed: asymmetric activations (better accuracy); performance: all symmetric")
+    parser.add_argument("--accurate-bias-correction", action="store_true",
+                        help="Slower, sometimes more accurate bias correction")
+    args = parser.parse_args()
+
+    images = calibration_images(args.images, args.subset, args.seed, args.prefix)
+    if not images:
+        print(f"[!] No calibration images named {args.prefix}* found in {args.images}")
+        sys.exit(1)
+    if len(images) < 100:
+        print(f"[!] Only {len(images)} calibration images; 300+ representative frames give more stable ranges")
+
+    path = quantize(args.model, args.output, images, args.preset, not args.accurate_bias_correction)
+    print(f"[+] INT8 model calibrated on {len(images)} images written to {path}")
+
+
+if __name__ == "__main__":
+    main()